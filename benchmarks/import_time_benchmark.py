@@ -0,0 +1,63 @@
+"""
+Start-up import time of the pyRMG entry points, measured with python -X importtime in a
+fresh interpreter per module. Fails if a heavy dependency is imported at module load or
+if an entry point exceeds --max_ms:
+
+    python benchmarks/import_time_benchmark.py
+    python benchmarks/import_time_benchmark.py --max_ms 500 --top 10
+"""
+import argparse
+import subprocess
+import sys
+
+ENTRY_POINTS = ['pyRMG.config_pyrmg_cli', 'pyRMG.generate_pyrmg_cli', 'pyRMG.submit_pyrmg_cli',
+                'pyRMG.matsemble_pyrmg_cli', 'pyRMG.cost_model', 'pyRMG.timing_db']
+
+# Only imported inside the code paths that need them
+HEAVY_MODULES = ['pymatgen', 'pandas', 'matensemble', 'scipy', 'ase']
+
+def import_times(module):
+    """{imported module: cumulative microseconds} of importing module in a new interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and guard the import time of the pyRMG CLIs")
+    parser.add_argument("--modules", "-m", nargs='+', default=ENTRY_POINTS, help="Modules to import")
+    parser.add_argument("--repeats", "-r", type=int, default=3, help="Fresh interpreters per module; the minimum is reported")
+    parser.add_argument("--max_ms", "-ms", type=float, default=None, help="Fail if a module takes longer than this to import")
+    parser.add_argument("--top", "-t", type=int, default=5, help="Slowest top-level imports to list per module")
+    args = parser.parse_args()
+
+    startup = set(import_times('sys'))  # Loaded by every interpreter before the module
+    failures = []
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeats)]
+        best = min(runs, key=lambda times: times[module])
+        total_ms = best[module] / 1000
+        print(f'{module}: {total_ms:8.1f} ms')
+        dependencies = sorted((name for name in best if '.' not in name and name not in startup
+                               and name != module.split('.')[0]),
+                              key=best.get, reverse=True)
+        for name in dependencies[:args.top]:
+            print(f'    {name:32s} {best[name] / 1000:8.1f} ms')
+
+        heavy = [name for name in best if name.split('.')[0] in HEAVY_MODULES]
+        if heavy:
+            failures.append(f'{module} imports {", ".join(sorted({name.split(".")[0] for name in heavy}))} at load')
+        if args.max_ms is not None and total_ms > args.max_ms:
+            failures.append(f'{module} takes {total_ms:.1f} ms to import, more than {args.max_ms} ms')
+
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
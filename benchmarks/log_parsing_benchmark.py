@@ -0,0 +1,117 @@
+"""
+Lines/second of the RMG log line parser before and after the compiled-regex tokenizer.
+
+Writes a synthetic relaxation log (cell updates, SCF chatter, @ION force tables and
+energies) of roughly --size_mb megabytes and times both the legacy eval-based branch
+logic and pyRMG.log_tokenizer.tokenize_line over every line. Before timing, checks on a
+small log that RMGLog.tail_frame returns the same final frame as a full parse for every
+window size, and exits non-zero if it does not.
+
+    python benchmarks/log_parsing_benchmark.py --size_mb 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from pyRMG.log_tokenizer import tokenize_line
+from pyRMG.rmg_log import RMGLog
+
+def write_synthetic_log(path, size_mb, natoms=200):
+    """Writes ionic steps until the file reaches size_mb megabytes; returns the line count."""
+    header = ("   X Basis Vector:      20.000000     0.000000     0.000000\n"
+              "   Y Basis Vector:       0.000000    20.000000     0.000000\n"
+              "   Z Basis Vector:       0.000000     0.000000    40.000000\n")
+    step_lines = []
+    for scf in range(20):
+        step_lines.append(f" quench: [md:   1/100  scf:  {scf:3d}/150  step time:   1.23  scf time:   {scf:6.2f} secs  RMS[dV]: 1.23e-04 ]\n")
+        step_lines.append(f"           @@ EIGENVALUE SUM     =     -101.234567 Ha\n")
+    step_lines.append("    final total energy from eig sum =    -1234.56789012 Ha\n")
+    step_lines.append("  @ION  Ion  Species       X           Y           Z       FX          FY          FZ      Movable\n")
+    for i in range(natoms):
+        step_lines.append(f"  @ION  {i + 1:4d}  {'Bi' if i % 2 else 'Se'}  {i * 0.1:10.6f}  {i * 0.2:10.6f}  {i * 0.3:10.6f}  1  "
+                          f"{-0.001 * i:12.8f}  {0.002:12.8f}  {0.003:12.8f}\n")
+    step_lines.append("\n")
+    for row in ("20.01 0.0 0.0", "0.0 20.01 0.0", "0.0 0.0 40.02"):
+        step_lines.append(f"  new lattice {row}\n")
+    step = ''.join(step_lines)
+
+    target = size_mb * 1024 * 1024
+    written, nlines = 0, 3
+    with open(path, 'w') as f:
+        f.write(header)
+        while written < target:
+            f.write(step)
+            written += len(step)
+            nlines += len(step_lines)
+    return nlines
+
+def legacy_tokenize(line):
+    """The branch logic RMGLog used before the tokenizer, kept here as the baseline."""
+    if "X Basis Vector" in line or "Y Basis Vector" in line or "Z Basis Vector" in line:
+        split_lines = line.split()
+        try:
+            return [float(split_lines[3]), float(split_lines[4]), float(split_lines[5])]
+        except IndexError:
+            return None
+    elif "lattice" in line:
+        split_lines = line.split()
+        try:
+            return [float(split_lines[2]), float(split_lines[3]), float(split_lines[4])]
+        except IndexError:
+            return None
+    elif "@ION" in line:
+        split_lines = line.split()
+        try:
+            if isinstance(eval(split_lines[1]), int):
+                return (split_lines[2], [float(split_lines[3]), float(split_lines[4]), float(split_lines[5])],
+                        [float(split_lines[7]), float(split_lines[8]), float(split_lines[9])])
+        except (NameError, IndexError):
+            return None
+    if "final total energy from eig sum" in line:
+        return float(line.split('=')[-1].strip().split()[0])
+    return None
+
+def check_tail_frame(path):
+    """Window sizes for which RMGLog.tail_frame differs from the last frame of a full parse."""
+    full = list(RMGLog.iter_frames(path))[-1]
+    mismatches = []
+    for block_size in range(1, os.path.getsize(path) + 2):
+        tail = RMGLog.tail_frame(path, block_size)
+        if not all(np.array_equal(tail[k], full[k]) for k in ('lattice', 'species', 'positions', 'forces', 'energy')):
+            mismatches.append(block_size)
+    return mismatches
+
+def time_tokenizer(path, tokenizer):
+    start = time.perf_counter()
+    with open(path, 'r') as f:
+        for line in f:
+            tokenizer(line)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RMG log line tokenization")
+    parser.add_argument("--size_mb", "-s", type=int, default=300, help="Size of the synthetic log in megabytes")
+    parser.add_argument("--natoms", "-na", type=int, default=200, help="Atoms per @ION block")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_path = os.path.join(tmp, 'rmg_input.check.log')
+        write_synthetic_log(check_path, 0.01, natoms=4)
+        mismatches = check_tail_frame(check_path)
+        print(f'tail_frame matches the full parse for {os.path.getsize(check_path) + 1 - len(mismatches)} of '
+              f'{os.path.getsize(check_path) + 1} window sizes')
+        if mismatches:
+            sys.exit(1)
+
+        log_path = os.path.join(tmp, 'rmg_input.00.log')
+        nlines = write_synthetic_log(log_path, args.size_mb, args.natoms)
+        print(f'Synthetic log: {os.path.getsize(log_path) / 1024**2:.1f} MB, {nlines} lines')
+
+        for name, tokenizer in (('legacy (eval)', legacy_tokenize), ('compiled regex', tokenize_line)):
+            elapsed = time_tokenizer(log_path, tokenizer)
+            print(f'{name:>16}: {elapsed:8.2f} s  {nlines / elapsed:14,.0f} lines/s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Quality and search time of pyRMG.processor_grid decompositions.
+
+Sweeps representative wavefunction grids (cubic bulk, slabs with vacuum, long-c vdW
+cells), gpus_per_node values and target node counts, and writes a JSON report that
+can be diffed between versions:
+
+    python benchmarks/processor_grid_benchmark.py --output before.json
+    python benchmarks/processor_grid_benchmark.py --output after.json
+    python benchmarks/processor_grid_benchmark.py --compare before.json after.json
+
+A sweep exits non-zero if a fixed-node decomposition lands above its target or below
+half of it (see off_target).
+"""
+import argparse
+import json
+import itertools
+import platform
+import sys
+import time
+import numpy as np
+from pyRMG.processor_grid import solve_processor_grid, MIN_DOMAIN_POINTS
+
+GRIDS = {
+    'cubic_48': [48, 48, 48],
+    'cubic_96': [96, 96, 96],
+    'cubic_192': [192, 192, 192],
+    'slab_96x96x384': [96, 96, 384],
+    'slab_144x144x480': [144, 144, 480],
+    'vdw_long_c_60x60x360': [60, 60, 360],
+    'vdw_long_c_72x72x576': [72, 72, 576],
+}
+GPUS_PER_NODE = [4, 8]
+FIX_NODES = [False, True]  # Free node count, and the --nodes/--cost_model path
+TARGET_NODES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+def decomposition_quality(grid_values, processor_grid, nodes, gpus_per_node):
+    """Per-GPU density std-dev, idle GPUs on the allocated nodes and largest-domain load imbalance."""
+    grid, processors = np.array(grid_values), np.array(processor_grid)
+    domains = -(-grid // processors)
+    return {
+        'density_std': float(np.std(grid / processors)),
+        'wasted_gpus': int(nodes * gpus_per_node - np.prod(processors)),
+        'load_imbalance': float(np.prod(domains) * np.prod(processors) / np.prod(grid) - 1),
+    }
+
+def run_sweep(engines, grid_divisibility_exponent, repeats):
+    results = []
+    for case, grid_values in GRIDS.items():
+        for gpus_per_node in GPUS_PER_NODE:
+            for target_nodes in TARGET_NODES:
+                for fix_nodes, engine in itertools.product(FIX_NODES, engines):
+                    times = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        processor_grid, nodes = solve_processor_grid(grid_values, target_nodes, gpus_per_node, 1,
+                                                                     grid_divisibility_exponent, fix_nodes, engine=engine)
+                        times.append(time.perf_counter() - start)
+                    processor_grid = [int(p) for p in processor_grid.split()]
+                    results.append({
+                        'case': case, 'grid': grid_values, 'gpus_per_node': gpus_per_node,
+                        'target_nodes': target_nodes, 'fix_nodes': fix_nodes, 'engine': engine,
+                        'search_time': min(times), 'processor_grid': processor_grid, 'nodes': nodes,
+                        **decomposition_quality(grid_values, processor_grid, nodes, gpus_per_node),
+                    })
+                    print(f'{case:>22} gpn={gpus_per_node} target={target_nodes:5d} fixed={fix_nodes:d} {engine:>10}: '
+                          f'{" ".join(map(str, processor_grid)):>12} on {nodes:5d} nodes '
+                          f'std={results[-1]["density_std"]:7.3f} wasted={results[-1]["wasted_gpus"]:4d} '
+                          f'{results[-1]["search_time"] * 1e3:9.2f} ms', flush=True)
+    return results
+
+def off_target(results):
+    """
+    fix_nodes results whose node count is above the target, or below half of it when the grid
+    can be split that far (each domain at least MIN_DOMAIN_POINTS along every axis).
+    """
+    flagged = []
+    for r in results:
+        if not r['fix_nodes']:
+            continue
+        splittable_nodes = np.prod(np.array(r['grid']) // MIN_DOMAIN_POINTS) / r['gpus_per_node']
+        if r['nodes'] > r['target_nodes'] or r['nodes'] < min(r['target_nodes'] / 2, splittable_nodes / 2):
+            flagged.append(r)
+    return flagged
+
+def key(result):
+    # Reports written before fix_nodes was swept only cover the free node count path
+    return result['case'], result['gpus_per_node'], result['target_nodes'], result.get('fix_nodes', False), result['engine']
+
+def compare(before_path, after_path):
+    """Prints every case whose decomposition changed, then aggregate quality and search time per engine."""
+    with open(before_path) as f:
+        before = {key(r): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = {key(r): r for r in json.load(f)['results']}
+
+    changed = 0
+    for k in sorted(set(before) & set(after)):
+        b, a = before[k], after[k]
+        if b['processor_grid'] != a['processor_grid'] or b['nodes'] != a['nodes']:
+            changed += 1
+            print(f'{k}: {b["processor_grid"]} on {b["nodes"]} -> {a["processor_grid"]} on {a["nodes"]} nodes, '
+                  f'std {b["density_std"]:.3f} -> {a["density_std"]:.3f}, wasted {b["wasted_gpus"]} -> {a["wasted_gpus"]}')
+    print(f'\n{changed} of {len(set(before) & set(after))} shared cases changed decomposition')
+
+    for fix_nodes, engine in sorted({k[3:] for k in set(before) | set(after)}):
+        for label, report in (('before', before), ('after', after)):
+            rows = [r for k, r in report.items() if k[3:] == (fix_nodes, engine)]
+            if rows:
+                print(f'{engine:>10} fixed={fix_nodes:d} {label:>6}: mean std {np.mean([r["density_std"] for r in rows]):.3f}, '
+                      f'wasted GPUs {sum(r["wasted_gpus"] for r in rows)}, '
+                      f'mean imbalance {np.mean([r["load_imbalance"] for r in rows]):.3f}, '
+                      f'mean nodes/target {np.mean([r["nodes"] / r["target_nodes"] for r in rows]):.3f}, '
+                      f'total search {sum(r["search_time"] for r in rows):.3f} s')
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark processor grid decomposition quality and search time")
+    parser.add_argument("--engines", "-e", nargs='+', default=['vectorized', 'divisor'],
+                        help="Engines to sweep ('loop' is the slow reference implementation)")
+    parser.add_argument("--grid_divisibility_exponent", "-gde", type=int, default=3)
+    parser.add_argument("--repeats", "-r", type=int, default=3, help="Timed repeats per case; the minimum is reported")
+    parser.add_argument("--output", "-o", default='processor_grid_benchmark.json', help="Path for the JSON report")
+    parser.add_argument("--compare", "-c", nargs=2, metavar=('BEFORE', 'AFTER'), help="Diff two existing reports instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_sweep(args.engines, args.grid_divisibility_exponent, args.repeats)
+    report = {
+        'metadata': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                     'grid_divisibility_exponent': args.grid_divisibility_exponent, 'repeats': args.repeats},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f'\nWrote {len(results)} cases to {args.output}')
+
+    flagged = off_target(results)
+    for r in flagged:
+        print(f'Off target: {r["case"]} gpn={r["gpus_per_node"]} target={r["target_nodes"]} {r["engine"]} '
+              f'chose {r["nodes"]} nodes')
+    if flagged:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Speed of writing rmg_input files for large supercells, checked byte-for-byte against the
+previous per-site string concatenation writer, both from string site_params and from the
+array site_params of the file read back:
+
+    python benchmarks/rmg_input_writer_benchmark.py
+    python benchmarks/rmg_input_writer_benchmark.py --structure POSCAR --supercells 10 20 30
+"""
+import argparse
+import os
+import tempfile
+import time
+from pymatgen.core import Structure
+from pyRMG.rmg_input import RMGInput
+
+EXAMPLE_STRUCTURE = os.path.join(os.path.dirname(__file__), '..', 'examples', 'run_directory', 'Bi2Se3', 'CONTCAR')
+EXAMPLE_YAML = os.path.join(os.path.dirname(__file__), '..', 'examples', 'yamls', 'vdW_full_relaxation.yml')
+
+def legacy_generate_rmg_input(rmg_input):
+    """The writer as it was before the bulk formatting path."""
+    writelines = ""
+    for key in sorted(rmg_input.keywords.keys()):
+        writelines += f'{key} = "{rmg_input.keywords[key]}"\n'
+    writelines += '\n'
+
+    writelines += f'atomic_coordinate_type = "Absolute"\n'
+    writelines += f'crds_units = "Angstrom"\n'
+    writelines += f'lattice_units = "Angstrom"\n\n'
+
+    lattice_vector_lines = 'lattice_vector = "\n'
+    for row in rmg_input.structure.lattice.matrix:
+        lattice_vector_lines += ' '.join(f"{f:.12e}" for f in row) + '\n'
+    lattice_vector_lines += '"\n'
+    writelines += lattice_vector_lines
+
+    writelines += f'atoms = "\n'
+    for i, site in enumerate(rmg_input.structure):
+        atom_line = ''
+        atom_line += str(site.specie) + ' '
+        atom_line += " ".join(f"{val:.12e}" for val in site.coords) + ' '
+        atom_line += rmg_input.site_params['selective_dynamics'][i] + ' '
+        atom_line += rmg_input.site_params['magnetic_properties'][i] + '\n'
+        writelines += atom_line
+    writelines += '"'
+
+    return writelines
+
+def with_string_site_params(rmg_input):
+    """Copy of rmg_input with the bool and float site_params arrays of a read input as per-site strings."""
+    selective_dynamics = [' '.join('1' if x else '0' for x in row) for row in rmg_input.site_params['selective_dynamics']]
+    magnetic_properties = [' '.join(str(x) for x in row) for row in rmg_input.site_params['magnetic_properties'].tolist()]
+    return RMGInput(structure=rmg_input.structure, keywords=rmg_input.keywords,
+                    site_params={'selective_dynamics': selective_dynamics, 'magnetic_properties': magnetic_properties})
+
+def best_time(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RMG input writer on supercells")
+    parser.add_argument("--structure", "-s", default=EXAMPLE_STRUCTURE, help="Unit cell to replicate")
+    parser.add_argument("--yaml", "-y", default=EXAMPLE_YAML, help="RMG parameter .yml")
+    parser.add_argument("--supercells", "-sc", type=int, nargs='+', default=[4, 10, 20, 30], help="Supercell sizes n for n x n x 1 cells")
+    parser.add_argument("--repeats", "-r", type=int, default=3, help="Timed repeats; the minimum is reported")
+    args = parser.parse_args()
+
+    unit_cell = Structure.from_file(args.structure)
+    base = RMGInput.from_yaml(args.yaml, structure_obj=unit_cell, target_nodes=1)
+    for n in args.supercells:
+        supercell = unit_cell * (n, n, 1)
+        supercell.perturb(0.01)
+        rmg_input = RMGInput(structure=supercell, keywords=base.keywords,
+                             site_params={'selective_dynamics': ["1 1 1"] * len(supercell),
+                                          'magnetic_properties': ["0.0 0.0 0.0"] * len(supercell)})
+
+        legacy = legacy_generate_rmg_input(rmg_input)
+        if rmg_input._generate_rmg_input() != legacy:
+            raise AssertionError(f'Writer output differs from the legacy writer for {len(supercell)} atoms')
+
+        legacy_time = best_time(lambda: legacy_generate_rmg_input(rmg_input), args.repeats)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rmg_input')
+            save_time = best_time(lambda: rmg_input.save(path), args.repeats)
+            reread = RMGInput(input_file=path)
+            if reread._generate_rmg_input() != legacy_generate_rmg_input(with_string_site_params(reread)):
+                raise AssertionError(f'Writer output from array site_params differs from the legacy writer for {len(supercell)} atoms')
+        print(f'{len(supercell):7d} atoms: legacy {legacy_time:8.3f} s, bulk save {save_time:8.3f} s '
+              f'({legacy_time / save_time:5.1f}x), {len(legacy) / 1e6:6.1f} MB, output identical')
+
+if __name__ == '__main__':
+    main()
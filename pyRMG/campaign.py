@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import sqlite3
+import collections
+
+CAMPAIGN_DATABASE_NAME = '.pyrmg_campaign.sqlite'
+
+# Job states recorded per directory
+NEW = 'new'  # rmg_input written, no logs yet
+NO_FORCEFIELD = 'no_forcefield'  # Logs written but no forcefield.xml
+UNCONVERGED = 'unconverged'
+CONVERGED = 'converged'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY, signature TEXT, state TEXT, calculation_mode TEXT, checked REAL, submitted REAL
+);
+"""
+
+class CampaignManifest:
+    """
+    SQLite record of every job directory of a campaign, stored at the campaign root.
+
+    Each directory's state is saved with a signature of the size and mtime of the files it was
+    derived from, so later scans only re-examine directories whose files changed. The time of
+    the last submission is kept until the signature changes, so submit_pyrmg --skip_submitted
+    can leave out directories whose jobs have not started yet.
+    """
+    def __init__(self, campaign_root):
+        self.path = os.path.join(os.path.abspath(campaign_root), CAMPAIGN_DATABASE_NAME)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.examined, self.reused = 0, 0
+
+    @staticmethod
+    def signature(run_directory, names):
+        """Size and mtime of names and every log of a scanner.RunDirectory, as a JSON string."""
+        files = {}
+        for name in list(names) + [os.path.basename(log) for log in run_directory.log_files]:
+            stat = run_directory.stat(name)
+            if stat is not None:
+                files[name] = [stat.st_size, stat.st_mtime_ns]
+        return json.dumps(files, sort_keys=True)
+
+    def lookup(self, path, signature):
+        """(state, calculation_mode) recorded for path if its files are unchanged, otherwise None."""
+        row = self.connection.execute('SELECT signature, state, calculation_mode FROM directories WHERE path = ?',
+                                      (path,)).fetchone()
+        if row is None or row['signature'] != signature:
+            return None
+        self.reused += 1
+        return row['state'], row['calculation_mode']
+
+    def record(self, path, signature, state, calculation_mode):
+        self.examined += 1
+        self.connection.execute('INSERT INTO directories (path, signature, state, calculation_mode, checked) '
+                                'VALUES (?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET signature = excluded.signature, '
+                                'state = excluded.state, calculation_mode = excluded.calculation_mode, checked = excluded.checked, '
+                                'submitted = CASE WHEN directories.signature = excluded.signature THEN directories.submitted END',
+                                (path, signature, state, calculation_mode, time.time()))
+
+    def mark_submitted(self, path):
+        self.connection.execute('UPDATE directories SET submitted = ? WHERE path = ?', (time.time(), path))
+
+    def is_submitted(self, path, signature):
+        """Whether path was submitted since its files last changed."""
+        row = self.connection.execute('SELECT signature, submitted FROM directories WHERE path = ?', (path,)).fetchone()
+        return row is not None and row['signature'] == signature and row['submitted'] is not None
+
+    def forget_missing(self, paths):
+        """Drops directories that are no longer part of the campaign."""
+        stored = {row['path'] for row in self.connection.execute('SELECT path FROM directories')}
+        self.connection.executemany('DELETE FROM directories WHERE path = ?', [(p,) for p in stored - set(paths)])
+
+    def states(self):
+        """Count of directories per state."""
+        return collections.Counter(row['state'] for row in self.connection.execute('SELECT state FROM directories'))
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,194 @@
+import os
+import json
+import math
+import argparse
+import numpy as np
+
+# Bytes per wavefunction value (complex double) and wavefunction-sized work arrays kept per state
+BYTES_PER_VALUE = 16
+WAVEFUNCTION_COPIES = 6
+
+def is_enabled(value):
+    return str(value).strip().lower() in ('true', '1', 'yes')
+
+def job_features(total_electrons, wavefunction_grid, kpoint_mesh, kpoint_distribution=1,
+                 unoccupied_states=0, spin_factor=1):
+    """
+    Size descriptors of one RMG job, per k-point group.
+
+    - grid_points: wavefunction grid points
+    - states: occupied plus unoccupied states per k-point
+    - kpoints_per_group: k-points each k-point group iterates over
+    - spin_factor: 2 for spin-polarized or spin-orbit (noncollinear) runs
+    """
+    kpoints = int(np.prod([int(k) for k in str(kpoint_mesh).split()]))
+    return {
+        'grid_points': int(np.prod([int(g) for g in str(wavefunction_grid).split()])),
+        'states': int(math.ceil(0.5 * total_electrons)) + int(unoccupied_states),
+        'kpoints_per_group': kpoints / max(1, int(kpoint_distribution)),
+        'spin_factor': spin_factor,
+    }
+
+def features_from_keywords(keywords, total_electrons):
+    """job_features from rmg_input keywords, as written by RMGInput.from_yaml."""
+    spin_factor = 2 if any(is_enabled(keywords.get(k, False)) for k in ('spinorbit', 'noncollinear', 'spin_polarization')) else 1
+    return job_features(total_electrons, keywords['wavefunction_grid'], keywords['kpoint_mesh'],
+                        keywords.get('kpoint_distribution', 1), keywords.get('unoccupied_states_per_kpoint', 0),
+                        spin_factor)
+
+def parse_walltime(walltime):
+    """Seconds in a [days-]hours:minutes:seconds walltime string."""
+    days, _, clock = str(walltime).rpartition('-')
+    seconds = 0
+    for part in clock.split(':'):
+        seconds = 60 * seconds + int(part)
+    return seconds + 86400 * int(days or 0)
+
+class AnalyticCostModel:
+    """
+    Predicts the wall time of one SCF step on a given number of GPUs:
+
+        t = hamiltonian * N_g*S*K*s / G + orthogonalization * N_g*S^2*K*s / G
+            + halo * N_g^(2/3)*S*K*s / G^(2/3) + latency * log2(G) + overhead
+
+    for N_g grid points, S states, K k-points per group, spin factor s and G GPUs. The
+    first two terms are applying the Hamiltonian and orthogonalizing/diagonalizing the
+    subspace, the halo term is the finite-difference boundary exchange and the latency
+    term global reductions. The default coefficients are order-of-magnitude values for a
+    Frontier GCD; fit them to measured runs with FittedCostModel.
+    """
+    TERMS = ('hamiltonian', 'orthogonalization', 'halo', 'latency', 'overhead')
+    DEFAULT_COEFFICIENTS = {'hamiltonian': 1.0e-9, 'orthogonalization': 5.0e-12, 'halo': 5.0e-9,
+                            'latency': 1.0e-2, 'overhead': 0.2}
+
+    def __init__(self, coefficients=None, gpu_memory_gb=64):
+        self.coefficients = dict(self.DEFAULT_COEFFICIENTS)
+        self.coefficients.update(coefficients or {})
+        self.gpu_memory_gb = gpu_memory_gb
+
+    @staticmethod
+    def terms(features, gpus):
+        volume = features['grid_points'] * features['states'] * features['kpoints_per_group'] * features['spin_factor']
+        return np.array([volume / gpus,
+                         volume * features['states'] / gpus,
+                         volume / features['grid_points'] ** (1 / 3) / gpus ** (2 / 3),
+                         math.log2(gpus) if gpus > 1 else 0.0,
+                         1.0])
+
+    def predict_step_time(self, features, gpus):
+        return float(np.dot([self.coefficients[t] for t in self.TERMS], self.terms(features, gpus)))
+
+    def memory_per_gpu_gb(self, features, gpus):
+        values = features['grid_points'] * features['states'] * features['kpoints_per_group'] * features['spin_factor']
+        return BYTES_PER_VALUE * WAVEFUNCTION_COPIES * values / gpus / 1024**3
+
+    def choose_nodes(self, features, gpus_per_node, walltime_seconds, scf_steps, max_nodes=4096, safety=0.9):
+        """
+        Node count per k-point group that maximizes throughput per node-hour.
+
+        Among node counts whose wavefunctions fit in GPU memory and whose predicted time for
+        scf_steps fits within safety * walltime_seconds, picks the one with the fewest
+        predicted node-seconds per job. If none meets the walltime, returns the fastest.
+        A walltime_seconds of None places no limit on the job time.
+        """
+        time_limit = safety * walltime_seconds if walltime_seconds is not None else float('inf')
+        best_nodes, best_cost = None, float('inf')
+        fastest_nodes, fastest_time = 1, float('inf')
+        for nodes in range(1, max_nodes + 1):
+            gpus = nodes * gpus_per_node
+            if self.memory_per_gpu_gb(features, gpus) > self.gpu_memory_gb:
+                continue
+            job_time = self.predict_step_time(features, gpus) * scf_steps
+            if job_time < fastest_time:
+                fastest_nodes, fastest_time = nodes, job_time
+            if job_time <= time_limit and nodes * job_time < best_cost:
+                best_nodes, best_cost = nodes, nodes * job_time
+        return best_nodes if best_nodes is not None else fastest_nodes
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'coefficients': self.coefficients, 'gpu_memory_gb': self.gpu_memory_gb}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            model = json.load(f)
+        return cls(model['coefficients'], model.get('gpu_memory_gb', 64))
+
+class FittedCostModel(AnalyticCostModel):
+    """AnalyticCostModel with coefficients fit by non-negative least squares to measured SCF step times."""
+    @classmethod
+    def fit(cls, records, gpu_memory_gb=64):
+        """records: dictionaries holding job_features keys plus 'gpus' and the measured 'step_time'."""
+        if not records:
+            raise ValueError('Cannot fit a cost model without timing records')
+        A = np.array([cls.terms(r, r['gpus']) for r in records])
+        b = np.array([r['step_time'] for r in records])
+
+        # Active-set NNLS: drop the most negative coefficient until all are non-negative
+        active = list(range(len(cls.TERMS)))
+        while True:
+            solution = np.linalg.lstsq(A[:, active], b, rcond=None)[0]
+            if np.all(solution >= 0) or len(active) == 1:
+                break
+            active.pop(int(np.argmin(solution)))
+        coefficients = {term: 0.0 for term in cls.TERMS}
+        for index, value in zip(active, solution):
+            coefficients[cls.TERMS[index]] = max(0.0, float(value))
+        return cls(coefficients, gpu_memory_gb)
+
+def timing_records(parent_directory, rmg_name='rmg_input', pseudopotentials_directory=''):
+    """Features, GPU count and median SCF step time of every run below parent_directory with timed logs."""
+    from pyRMG.rmg_input import RMGInput
+    from pyRMG.rmg_log import RMGLog
+
+    records = []
+    for root, _, files in os.walk(os.path.abspath(parent_directory)):
+        logs = sorted(f for f in files if f.startswith('rmg_input.') and f.endswith('.log'))
+        if rmg_name not in files or not logs:
+            continue
+        rmg_input = RMGInput(input_file=os.path.join(root, rmg_name))
+        keywords = rmg_input.keywords
+        if 'processor_grid' not in keywords or 'wavefunction_grid' not in keywords or 'kpoint_mesh' not in keywords:
+            continue
+        step_times = [step[2] for log in logs for step in RMGLog.scf_steps(os.path.join(root, log))]
+        if not step_times:
+            continue
+
+        total_electrons = rmg_input.valence_electrons(pseudopotentials_directory)
+        if total_electrons is None:
+            print(f'Skipping {root}: not all elements have known valences')
+            continue
+        records.append({**features_from_keywords(keywords, total_electrons),
+                        'directory': root,
+                        'gpus': int(np.prod([int(p) for p in keywords['processor_grid'].split()])),
+                        'step_time': float(np.median(step_times))})
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit an RMG SCF-step cost model from finished runs")
+    parser.add_argument("--parent_directory", "-pd", help="Directory tree of RMG runs with rmg_input.*.log files")
+    parser.add_argument("--timing_database", "-tdb", help="Fit to the runs of a timings_pyrmg database instead")
+    parser.add_argument("--output", "-o", required=True, help="Path for the fitted model .json")
+    parser.add_argument("--rmg_name", "-rn", default='rmg_input', help="Naming convention for the RMG input files")
+    parser.add_argument("--pseudopotentials_directory", "-pspd", default='', help="Path to pseudopotentials directory")
+    parser.add_argument("--gpu_memory_gb", "-gm", type=float, default=64, help="Memory per GPU in GB")
+    args = parser.parse_args()
+
+    if args.timing_database:
+        from pyRMG.timing_db import TimingDatabase
+        database = TimingDatabase(args.timing_database)
+        if args.parent_directory:
+            database.harvest(args.parent_directory, args.rmg_name, args.pseudopotentials_directory)
+        records = database.records()
+        database.close()
+    elif args.parent_directory:
+        records = timing_records(args.parent_directory, args.rmg_name, args.pseudopotentials_directory)
+    else:
+        parser.error('--parent_directory or --timing_database is required')
+    model = FittedCostModel.fit(records, args.gpu_memory_gb)
+    model.save(args.output)
+    print(f'Fit {len(records)} runs; coefficients {model.coefficients} saved to {args.output}')
+
+if __name__ == '__main__':
+    main()
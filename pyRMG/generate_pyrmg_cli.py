@@ -3,10 +3,17 @@ from pyRMG.forcefield import Forcefield
 from pyRMG.rmg_log import RMGLog
 from pyRMG.rmg_input import RMGInput
 from pyRMG.convergence import RMGConvergence
-from pyRMG.submitter import Submitter
-from pymatgen.core.structure import Structure
+from pyRMG.processor_grid import set_persistent_cache, processor_grid_cache_info
+from pyRMG.valence import set_valence_cache
+from pyRMG.cost_model import AnalyticCostModel, parse_walltime
+from pyRMG.scanner import scan_tree
+from pyRMG.generation_record import RECORD_NAME, inputs_digest, is_unchanged, write_record
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import collections
+import contextlib
+import io
 import os
 import sys
 
@@ -49,8 +56,21 @@ def main():
 
     parser.add_argument("--electrons_per_gpu", "-epg", help="Number of valence electrons (based on atoms and PPs) per gpu", type=int, default=10)
     parser.add_argument("--grid_divisibility_exponent", "-gde", help="Exponential factor for processor grid divisibility", type=divisibility_exponent, default=3)
+    parser.add_argument("--cost_model", "-cm", help="Size nodes with a cost model instead of --electrons_per_gpu: 'analytic', or a fitted model .json "
+                        "(costmodel_pyrmg); ignored when --nodes is set", type=str, default=config.get("cost_model", None))
+    parser.add_argument("--expected_scf_steps", "-ess", help="Total SCF steps the cost model budgets against --time", type=int, default=200)
+    parser.add_argument("--gpu_memory_gb", "-gm", help="Memory per GPU in GB for the cost model", type=float, default=config.get("gpu_memory_gb", 64))
+    parser.add_argument("--processor_grid_engine", "-pge", help="Processor grid search: 'vectorized' shifted-grid heuristic, or 'divisor' for exact " 
+                        "factorizations scored by load balance and halo cost", choices=['vectorized', 'loop', 'divisor'], default='vectorized')
+    parser.add_argument("--processor_grid_cache", "-pgc", help="Path to an SQLite table of solved processor grids shared between runs", 
+                        type=str, default=config.get("processor_grid_cache", None))
+    parser.add_argument("--valence_cache", "-vc", help="Path to an SQLite table of pseudopotential z_valence values keyed by file hash, shared between runs",
+                        type=str, default=config.get("valence_cache", None))
     parser.add_argument("--debug", "-d", help="Whether to write debug QOS to submission script", action="store_true")
     parser.add_argument("--time", "-t", help="Calculation wall time, with default format hours:minutes:seconds", type=str, default=config.get("time", "02:00:00"))
+    parser.add_argument("--workers", "-w", help="Processes generating directories in parallel; 0 uses every CPU", type=int, default=1)
+    parser.add_argument("--skip_unchanged", "-su", help="Skip directories whose YAML, template, structure, MAGMOM, logs and arguments are unchanged "
+                        f"since their inputs were last generated (recorded in {RECORD_NAME})", action="store_true")
 
     # Parse arguments and run function
     args = parser.parse_args()
@@ -109,85 +129,162 @@ def create_rmg_submission(copy_path, write_path, nodes, args):
     write_text(final_lines, write_path)
     return
 
+def build_cost_model(args):
+    if args.cost_model == 'analytic':
+        return AnalyticCostModel(gpu_memory_gb=args.gpu_memory_gb)
+    elif args.cost_model:
+        cost_model = AnalyticCostModel.load(args.cost_model)
+        cost_model.gpu_memory_gb = args.gpu_memory_gb
+        return cost_model
+    return None
+
+def is_job_directory(run_directory, args):
+    ''' Whether a scanned directory holds an rmg_input, a structure file or RMG logs '''
+    return (args.rmg_name in run_directory or args.structure_filename in run_directory
+            or bool(run_directory.log_files))
+
+def generate_directory(run_directory, args, cost_model):
+    ''' Writes the rmg_input and submission script of one scanned directory; returns 'generated', 'unchanged', 'converged' or 'skipped' '''
+    root = run_directory.path
+
+    if args.skip_unchanged:
+        digest = inputs_digest(run_directory, args)
+        if is_unchanged(run_directory, digest):
+            print(f'Inputs for {root} are unchanged since they were generated; skipping\n')
+            return 'unchanged'
+
+    # Check convergence
+    forcefield_path = run_directory.file_path('forcefield.xml')
+    rmg_path = run_directory.file_path(args.rmg_name)
+
+    if forcefield_path and rmg_path:
+        forcefield = Forcefield(forcefield_xml_path=forcefield_path)
+        rmg_input = RMGInput(input_file=rmg_path, header_only=True)
+        convergence_checker = RMGConvergence(forcefield=forcefield, 
+                                             rmg_input=rmg_input)
+        if convergence_checker.is_converged():
+            print(f'{OK_GREEN}{convergence_checker.calculation_mode} job in {root} is converged, no inputs generated.{ENDC}\n')
+            return 'converged'
+        else:
+            print(f'{FAIL_RED}Unconverged {convergence_checker.calculation_mode} job in {root}, inputs generated.{ENDC}')
+
+    # Choose the input structure
+    structure_path = run_directory.file_path(args.structure_filename)
+    available_logs = run_directory.log_files
+    
+    rmg_input = RMGInput(input_file=rmg_path) if rmg_path else None
+    magmom_path = run_directory.file_path(args.magmom_name)
+    final_structure = None
+
+    if available_logs:
+        image, final_structure = RMGLog(root, log_files=available_logs).last_image()  # Newest log with a complete frame
+        if final_structure:
+            print(f'Generating input for {root} from final structure of {image}')
+
+    elif rmg_input:
+        print(f'No valid structures found in logs for {root}; defaulting to {args.rmg_name}')
+        final_structure = rmg_input.structure
+    
+    elif structure_path:
+        print(f'No valid structures found in logs or {args.rmg_name} for {root}; defaulting to {args.structure_filename}')
+        from pymatgen.core import Structure
+        final_structure = Structure.from_file(structure_path)
+
+    if not final_structure: # Cannot find a valid structure file
+        return 'skipped'
+
+    # Create the new rmg_input file
+    if rmg_input:
+        for prop_key, prop_value in rmg_input.site_properties().items():
+            final_structure.add_site_property(prop_key, prop_value)
+
+    rmg_input = RMGInput.from_yaml(yaml_path=args.rmg_yaml, 
+                         structure_path=None,
+                         structure_obj=final_structure, 
+                         pseudopotentials_directory=args.pseudopotentials_directory,
+                         magmom_path=magmom_path, 
+                         target_nodes=args.nodes, 
+                         gpus_per_node=args.gpus_per_node,
+                         electrons_per_gpu=args.electrons_per_gpu, 
+                         grid_divisibility_exponent=args.grid_divisibility_exponent,
+                         processor_grid_engine=args.processor_grid_engine,
+                         cost_model=cost_model,
+                         walltime_seconds=parse_walltime(args.time),
+                         expected_scf_steps=args.expected_scf_steps)
+    rmg_input.save(filename=os.path.join(root, args.rmg_name))
+
+    # Create the submission script template
+    submission_name = Path(args.rmg_submission).name
+    write_path = os.path.join(root, submission_name)
+    
+    print(f'Generating {submission_name} for {root}\n')
+    create_rmg_submission(copy_path=args.rmg_submission, 
+                          write_path=write_path, 
+                          nodes=rmg_input.target_nodes,
+                          args=args)
+    if args.skip_unchanged:
+        write_record(root, digest, (args.rmg_name, submission_name))
+    return 'generated'
+
+def generate_task(task):
+    ''' Runs generate_directory with its console output buffered; returns (output, status, error, cache counts) '''
+    run_directory, args, cost_model = task
+    before = processor_grid_cache_info()
+    buffer = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(buffer):
+        try:
+            status = generate_directory(run_directory, args, cost_model)
+        except (Exception, SystemExit) as e:  # RMGInput exits on unreadable inputs
+            status, error = 'failed', f'{type(e).__name__}: {e}'
+            print(f'{FAIL_RED}Failed to generate inputs for {run_directory.path}: {error}{ENDC}\n')
+    after = processor_grid_cache_info()
+    counts = {k: after[k] - before[k] for k in ('hits', 'misses', 'persistent_hits')}
+    return buffer.getvalue(), status, error, counts
+
+def initialize_caches(processor_grid_cache, valence_cache):
+    ''' Enables the persistent tables in this process; also the process-pool initializer '''
+    if processor_grid_cache:
+        set_persistent_cache(processor_grid_cache)
+    if valence_cache:
+        set_valence_cache(valence_cache)
+
 def generate(args):
+    initialize_caches(args.processor_grid_cache, args.valence_cache)
+    cost_model = build_cost_model(args)
+
     abs_poscars_directory = os.path.abspath(args.parent_directory)
-    for root, _, _ in os.walk(abs_poscars_directory):
-        generate_inputs = True
-
-        # Check convergence
-        forcefield_path = os.path.join(root, 'forcefield.xml')
-        rmg_path = os.path.join(root, args.rmg_name)
-
-        if os.path.exists(forcefield_path) and os.path.exists(rmg_path):
-            forcefield = Forcefield(forcefield_xml_path=forcefield_path)
-            rmg_input = RMGInput(input_file=rmg_path)
-            convergence_checker = RMGConvergence(forcefield=forcefield, 
-                                                 rmg_input=rmg_input)
-            if convergence_checker.is_converged():
-                print(f'{OK_GREEN}{convergence_checker.calculation_mode} job in {root} is converged, no inputs generated.{ENDC}\n')
-                generate_inputs = False
-            else:
-                print(f'{FAIL_RED}Unconverged {convergence_checker.calculation_mode} job in {root}, inputs generated.{ENDC}')
-
-        # Choose the input structure
-        structure_path = os.path.join(root, args.structure_filename)
-        rmg_input_path = os.path.join(root, args.rmg_name)
-        available_logs = Submitter.find_files(root, 'rmg_input.*.log')
-        
-        rmg_input = RMGInput(input_file=rmg_input_path) if os.path.exists(rmg_input_path) else None
-        magmom_path = os.path.join(root, args.magmom_name) if os.path.exists(os.path.join(root, args.magmom_name)) else None
-        final_structure = None
-
-        if generate_inputs:
-            if available_logs:
-                rmg_logs = RMGLog(root)
-                log_images = sorted(rmg_logs.logs_data.keys(), reverse=True)  # Sort in descending order
-                        
-                for image in log_images:
-                    structures = rmg_logs.logs_data[image].get('structures', [])
-                    if structures:  # Ensure there are structures available
-                        print(f'Generating input for {root} from final structure of {image}')
-                        final_structure = structures[-1]
-                        break  # Exit loop once we find a valid structure
-
-            elif rmg_input:
-                print(f'No valid structures found in logs for {root}; defaulting to {args.rmg_name}')
-                final_structure = rmg_input.structure
-            
-            elif os.path.exists(structure_path):
-                print(f'No valid structures found in logs or {args.rmg_name} for {root}; defaulting to {args.structure_filename}')
-                final_structure = Structure.from_file(structure_path)
-
-            else: # Cannot find a valid structure file
-                continue
-                
-        # Create the new rmg_input file if final_structure exists
-        if final_structure:
-            if rmg_input:
-                for prop_key, prop_value in rmg_input.site_params.items():
-                    final_structure.add_site_property(prop_key, prop_value)
-
-            rmg_input = RMGInput.from_yaml(yaml_path=args.rmg_yaml, 
-                                 structure_path=None,
-                                 structure_obj=final_structure, 
-                                 pseudopotentials_directory=args.pseudopotentials_directory,
-                                 magmom_path=magmom_path, 
-                                 target_nodes=args.nodes, 
-                                 gpus_per_node=args.gpus_per_node,
-                                 electrons_per_gpu=args.electrons_per_gpu, 
-                                 grid_divisibility_exponent=args.grid_divisibility_exponent)
-            rmg_input.save(filename=os.path.join(root, args.rmg_name))
-
-            # Create the submission script template
-            submission_name = Path(args.rmg_submission).name
-            write_path = os.path.join(root, submission_name)
-            
-            print(f'Generating {submission_name} for {root}\n')
-            create_rmg_submission(copy_path=args.rmg_submission, 
-                                  write_path=write_path, 
-                                  nodes=rmg_input.target_nodes,
-                                  args=args)
+    run_directories = scan_tree(abs_poscars_directory, (args.rmg_name, args.structure_filename, args.magmom_name, 'forcefield.xml',
+                                                        RECORD_NAME))
+    # Parents, empty intermediate directories and the like are not jobs and are left out of the summary
+    tasks = [(run_directory, args, cost_model) for run_directory in run_directories if is_job_directory(run_directory, args)]
+
+    # Each directory's output is printed whole and in scan order, whichever process generated it
+    workers = args.workers or os.cpu_count()
+    executor = None
+    if workers > 1 and len(tasks) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=initialize_caches,
+                                       initargs=(args.processor_grid_cache, args.valence_cache))
+        results = executor.map(generate_task, tasks, chunksize=max(1, len(tasks) // (16 * workers)))
+    else:
+        results = map(generate_task, tasks)
+
+    statuses, cache_counts, failures = collections.Counter(), collections.Counter(), {}
+    for (run_directory, _, _), (output, status, error, counts) in zip(tasks, results):
+        print(output, end='')
+        statuses[status] += 1
+        cache_counts.update(counts)
+        if error:
+            failures[run_directory.path] = error
+    if executor:
+        executor.shutdown()
 
+    print(f'Generated inputs for {statuses["generated"]} directories; {statuses["unchanged"]} unchanged, {statuses["converged"]} converged, '
+          f'{statuses["skipped"]} without structures, {statuses["failed"]} failed')
+    for path, error in failures.items():
+        print(f'{FAIL_RED}  {path}: {error}{ENDC}')
+    print(f'Processor grid cache: {cache_counts["hits"]} hits, {cache_counts["misses"]} misses '
+          f'({cache_counts["persistent_hits"]} found in the persistent table)')
     return 
 
 if __name__ == '__main__':
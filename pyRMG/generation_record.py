@@ -0,0 +1,60 @@
+import os
+import json
+import hashlib
+
+RECORD_NAME = '.pyrmg_generate.json'
+
+# generate_pyrmg arguments that do not change the files written
+IGNORED_ARGUMENTS = ('parent_directory', 'workers', 'skip_unchanged', 'processor_grid_cache', 'valence_cache')
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 hex digest of the contents of path."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def inputs_digest(run_directory, args):
+    """
+    Digest of everything generate_pyrmg reads to write a directory's inputs.
+
+    Covers the YAML, submission template and cost model contents, the structure, MAGMOM
+    and forcefield.xml files of the scanned directory, and the remaining CLI arguments.
+    Logs only grow, so they enter by size and mtime rather than by content.
+    """
+    arguments = {k: v for k, v in sorted(vars(args).items()) if k not in IGNORED_ARGUMENTS}
+    parts = {'arguments': arguments,
+             'rmg_yaml': file_digest(args.rmg_yaml),
+             'rmg_submission': file_digest(args.rmg_submission)}
+    if args.cost_model and os.path.isfile(args.cost_model):
+        parts['cost_model'] = file_digest(args.cost_model)
+    for name in (args.structure_filename, args.magmom_name, 'forcefield.xml'):
+        path = run_directory.file_path(name)
+        parts[name] = file_digest(path) if path else None
+    parts['logs'] = {os.path.basename(log): [run_directory.stat(os.path.basename(log)).st_size,
+                                             run_directory.stat(os.path.basename(log)).st_mtime_ns]
+                     for log in run_directory.log_files}
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def is_unchanged(run_directory, digest):
+    """Whether the recorded inputs digest matches and every recorded output is as it was written."""
+    record_path = run_directory.file_path(RECORD_NAME)
+    if not record_path:
+        return False
+    try:
+        with open(record_path, 'r') as f:
+            record = json.load(f)
+        if record['inputs'] != digest:
+            return False
+        return all(file_digest(os.path.join(run_directory.path, name)) == output_digest
+                   for name, output_digest in record['outputs'].items())
+    except (OSError, ValueError, KeyError):
+        return False
+
+def write_record(directory, digest, output_names):
+    """Records the inputs digest and the digests of the files just generated in directory."""
+    record = {'inputs': digest,
+              'outputs': {name: file_digest(os.path.join(directory, name)) for name in output_names}}
+    with open(os.path.join(directory, RECORD_NAME), 'w') as f:
+        json.dump(record, f, indent=1)
@@ -0,0 +1,85 @@
+import os
+import re
+import time
+import tempfile
+import collections
+
+ARRAY_DIRECTORY_NAME = '.pyrmg_arrays'
+
+# Scheduler details per submission script suffix
+SCHEDULERS = {
+    '.sh': {'command': 'sbatch', 'directive': '#SBATCH', 'task_id': 'SLURM_ARRAY_TASK_ID', 'first_id': 0},
+    '.lsf': {'command': 'bsub', 'directive': '#BSUB', 'task_id': 'LSB_JOBINDEX', 'first_id': 1},
+}
+
+LSF_JOB_NAME = re.compile(r'^#BSUB\s+-J\s+("?)([^"\s]*)\1\s*$')
+
+def group_scripts(scripts):
+    """
+    Groups (directory, script path) pairs whose scripts have identical names and contents.
+
+    generate_pyrmg writes every directory's script from one template with the resources
+    filled in, so identical scripts request identical resources and can share one array.
+    Returns a list of (script name, script text, [directories]) in first-seen order.
+    """
+    groups = collections.OrderedDict()
+    for directory, script in scripts:
+        with open(script, 'r') as f:
+            text = f.read()
+        groups.setdefault((os.path.basename(script), text), []).append(directory)
+    return [(name, text, directories) for (name, text), directories in groups.items()]
+
+def array_script(text, suffix, index_file, n_tasks, throttle=0):
+    """
+    Job array version of a single-directory submission script.
+
+    Adds the array directive after the script's last scheduler directive, followed by a cd
+    into the directory of this array task as listed in index_file, so the original commands
+    run unchanged in each job directory.
+    """
+    scheduler = SCHEDULERS[suffix]
+    first, last = scheduler['first_id'], scheduler['first_id'] + n_tasks - 1
+    limit = f'%{throttle}' if throttle else ''
+    lines = text.rstrip('\n').split('\n')
+    if suffix == '.sh':
+        array_lines = [f'#SBATCH --array={first}-{last}{limit}']
+    else:
+        # LSF declares arrays through the job name, so the existing -J line is replaced
+        matches = [LSF_JOB_NAME.match(line) for line in lines]
+        name = next((match.group(2) for match in matches if match), 'pyrmg')
+        lines = [line for line, match in zip(lines, matches) if not match]
+        array_lines = [f'#BSUB -J "{name}[{first}-{last}]{limit}"']
+    header_end = max([i + 1 for i, line in enumerate(lines) if line.startswith(scheduler['directive'])], default=1)
+
+    cd_lines = ['',
+                '# Move to the directory of this array task',
+                f'cd "$(sed -n "$(( ${scheduler["task_id"]} - {first} + 1 ))p" "{index_file}" | cut -d" " -f2-)" || exit 1']
+    return '\n'.join(lines[:header_end] + array_lines + cd_lines + lines[header_end:]) + '\n'
+
+def write_arrays(top, groups, max_array_size=1000, throttle=0):
+    """
+    Writes one array script and index file per group, splitting groups larger than max_array_size.
+
+    Files go to a new time-stamped directory under top/.pyrmg_arrays, so arrays still running
+    keep reading their own index files. Each index line is '<array task id> <directory>'.
+    Returns a list of dictionaries with the script path, command, index path and directories.
+    """
+    arrays_root = os.path.join(os.path.abspath(top), ARRAY_DIRECTORY_NAME)
+    os.makedirs(arrays_root, exist_ok=True)
+    array_directory = tempfile.mkdtemp(prefix=time.strftime('%Y%m%d-%H%M%S-'), dir=arrays_root)
+    arrays = []
+    for name, text, directories in groups:
+        stem, suffix = os.path.splitext(name)
+        scheduler = SCHEDULERS[suffix]
+        for start in range(0, len(directories), max_array_size):
+            chunk = directories[start:start + max_array_size]
+            label = f'{len(arrays):03d}_{stem}'
+            index_path = os.path.join(array_directory, f'{label}.index')
+            with open(index_path, 'w') as f:
+                f.write(''.join(f'{scheduler["first_id"] + i} {directory}\n' for i, directory in enumerate(chunk)))
+            script_path = os.path.join(array_directory, f'{label}{suffix}')
+            with open(script_path, 'w') as f:
+                f.write(array_script(text, suffix, index_path, len(chunk), throttle))
+            arrays.append({'script': script_path, 'command': scheduler['command'],
+                           'index': index_path, 'directories': chunk})
+    return arrays
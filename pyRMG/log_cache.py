@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+import zipfile
+import numpy as np
+from pyRMG.rmg_log import RMGLog, RMGLogParser
+from pyRMG.trajectory import RMGTrajectory
+
+# Central cache of parsed logs, next to the pyRMG config
+CACHE_DIRECTORY = os.path.expanduser("~/.pyRMG/cache/logs")
+
+# Bytes before the resume offset hashed to confirm a grown log was only appended to
+FINGERPRINT_BYTES = 4096
+
+class LogCache:
+    """
+    Compressed .npz record of the parsed frames of each rmg_input.*.log.
+
+    Entries are keyed by the absolute log path and validated against the log's inode,
+    size and mtime. When a log has only grown, parsing resumes from the saved byte offset
+    and parser state instead of starting over.
+    """
+    def __init__(self, cache_directory=CACHE_DIRECTORY):
+        self.cache_directory = cache_directory
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+    def cache_path(self, log_file):
+        key = hashlib.sha1(os.path.abspath(log_file).encode()).hexdigest()
+        return os.path.join(self.cache_directory, f'{key}.npz')
+
+    def load(self, log_file):
+        """Returns the RMGTrajectory of log_file, parsing only what the cache does not cover."""
+        stat = os.stat(log_file)
+        cached = self._read(log_file)
+
+        if cached is not None and cached['inode'] == stat.st_ino:
+            if cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+                return cached['trajectory']
+            if (stat.st_size > cached['size'] and
+                    self._fingerprint(log_file, cached['offset']) == cached['fingerprint']):
+                parser = RMGLogParser.from_state(cached['state'])
+                frames, _, offset = RMGLog.scan_frames(log_file, cached['offset'], parser)
+                trajectory = cached['trajectory'].extend(frames)
+                self._write(log_file, stat, trajectory, offset, parser.get_state())
+                return trajectory
+
+        parser = RMGLogParser()
+        frames, _, offset = RMGLog.scan_frames(log_file, 0, parser)
+        trajectory = RMGTrajectory.from_frames(frames)
+        self._write(log_file, stat, trajectory, offset, parser.get_state())
+        return trajectory
+
+    @staticmethod
+    def _fingerprint(log_file, offset):
+        with open(log_file, 'rb') as f:
+            f.seek(max(0, offset - FINGERPRINT_BYTES))
+            return hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+    def _read(self, log_file):
+        path = self.cache_path(log_file)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return {
+                    'inode': int(data['inode']),
+                    'size': int(data['size']),
+                    'mtime_ns': int(data['mtime_ns']),
+                    'offset': int(data['offset']),
+                    'fingerprint': str(data['fingerprint']),
+                    'state': json.loads(str(data['state'])),
+                    'trajectory': RMGTrajectory(data['species'].tolist(), data['lattices'], data['positions'],
+                                                data['forces'], data['energies']),
+                }
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None  # Unreadable entries are rebuilt
+
+    def _write(self, log_file, stat, trajectory, offset, state):
+        path = self.cache_path(log_file)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f,
+                                inode=stat.st_ino, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                                offset=offset, fingerprint=self._fingerprint(log_file, offset),
+                                state=json.dumps(state),
+                                species=np.array(trajectory.species, dtype=str),
+                                lattices=trajectory.lattices, positions=trajectory.positions,
+                                forces=trajectory.forces, energies=trajectory.energies)
+        os.replace(tmp_path, path)
@@ -0,0 +1,69 @@
+import re
+
+# Record kinds returned by tokenize_line
+BASIS_VECTOR = 'basis_vector'
+LATTICE = 'lattice'
+ION = 'ion'
+ENERGY = 'energy'
+SCF_STEP = 'scf_step'
+TOTAL_TIME = 'total_time'
+
+FLOAT = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+
+# "   X Basis Vector:      10.000000     0.000000     0.000000"
+BASIS_VECTOR_RECORD = re.compile(rf'\s*[XYZ] Basis Vector\S*\s+({FLOAT})\s+({FLOAT})\s+({FLOAT})(?:\s|$)')
+
+# Lattice rows carry the "lattice" tag in one of the two leading fields and the vector in the next three
+LATTICE_RECORD = re.compile(rf'\s*(?:\S*lattice\S*\s+\S+|\S+\s+\S*lattice\S*)\s+({FLOAT})\s+({FLOAT})\s+({FLOAT})(?:\s|$)')
+
+# "@ION  <index> <species> <x> <y> <z> <movable> <fx> <fy> <fz> ..."
+ION_RECORD = re.compile(rf'\s*@ION\s+\d+\s+(\S+)\s+({FLOAT})\s+({FLOAT})\s+({FLOAT})\s+\S+\s+({FLOAT})\s+({FLOAT})\s+({FLOAT})(?:\s|$)')
+
+ENERGY_RECORD = re.compile(rf'final total energy from eig sum\s*=\s*({FLOAT})')
+
+# " quench: [md:   0/100  scf:   5/150  step time:   0.56  scf time:     3.21 secs  RMS[dV]: 4.75e-04 ]"
+SCF_STEP_RECORD = re.compile(rf'md:\s*(\d+)/\d+\s+scf:\s*(\d+)/\d+\s+step time:\s*({FLOAT})\s+scf time:\s*({FLOAT})')
+
+# First row of the closing timing report: "1-TOTAL    1234.56   ..."
+TOTAL_TIME_RECORD = re.compile(rf'\s*1-TOTAL\s+({FLOAT})(?:\s|$)')
+
+def tokenize_line(line):
+    """
+    Classifies a single RMG log line.
+
+    Returns None for lines that carry no parsable record, otherwise a (kind, values) tuple:
+    - BASIS_VECTOR / LATTICE: [a, b, c] lattice row in Bohr
+    - ION: (species, [x, y, z], [fx, fy, fz]) in Bohr and Rydberg/Bohr
+    - ENERGY: total energy as a float
+    - SCF_STEP: (ionic step, scf step, step time, cumulative scf time) in seconds
+    - TOTAL_TIME: total run time in seconds from the closing timing report
+    Substring checks run first so the regexes are only applied to candidate lines.
+    """
+    if '@ION' in line:
+        match = ION_RECORD.match(line)
+        if match:
+            groups = match.groups()
+            return ION, (groups[0], [float(groups[1]), float(groups[2]), float(groups[3])],
+                         [float(groups[4]), float(groups[5]), float(groups[6])])
+    elif 'Basis Vector' in line:
+        match = BASIS_VECTOR_RECORD.match(line)
+        if match:
+            return BASIS_VECTOR, [float(v) for v in match.groups()]
+    elif 'lattice' in line:
+        match = LATTICE_RECORD.match(line)
+        if match:
+            return LATTICE, [float(v) for v in match.groups()]
+    elif 'final total energy from eig sum' in line:
+        match = ENERGY_RECORD.search(line)
+        if match:
+            return ENERGY, float(match.group(1))
+    elif 'step time' in line:
+        match = SCF_STEP_RECORD.search(line)
+        if match:
+            groups = match.groups()
+            return SCF_STEP, (int(groups[0]), int(groups[1]), float(groups[2]), float(groups[3]))
+    elif '1-TOTAL' in line:
+        match = TOTAL_TIME_RECORD.match(line)
+        if match:
+            return TOTAL_TIME, float(match.group(1))
+    return None
@@ -3,11 +3,14 @@ from pyRMG.rmg_input import RMGInput
 from pyRMG.forcefield import Forcefield
 from pyRMG.submitter import Submitter
 from pyRMG.convergence import RMGConvergence
+from pyRMG.cost_model import AnalyticCostModel, features_from_keywords, parse_walltime
+from pyRMG.scheduler import pack_tasks, recommend_allocation, format_plan
+from pyRMG.scanner import scan_tree
 import glob
 import argparse
 import os
+import sys
 import numpy as np
-import pandas as pd
 
 def main():
     config = load_config()
@@ -24,6 +27,15 @@ def main():
     parser.add_argument("--gpus_per_task", "-gpt", help="GPUs per task", type=int, default=config.get("gpus_per_task", 1))
 
     parser.add_argument("--write_restart_freq", "-wrf", help="Write restart frequency", type=int, default=5)
+
+    # Packing plan: task runtimes are predicted with a cost model and packed onto node-granular bins
+    parser.add_argument("--gpus_per_node", "-gpn", help="Number of GPUs per node on your resource", type=int, default=config.get("gpus_per_node", 8))
+    parser.add_argument("--allocation_nodes", "-N", help="Nodes available to tasks; defaults to SLURM_NNODES minus the Flux management node, "
+                        "or the recommended allocation on a dry run", type=int, default=None)
+    parser.add_argument("--cost_model", "-cm", help="Fitted cost model .json (costmodel_pyrmg) for runtime predictions; "
+                        "defaults to the analytic model", type=str, default=config.get("cost_model", None))
+    parser.add_argument("--expected_scf_steps", "-ess", help="SCF steps per task used to predict runtimes", type=int, default=200)
+    parser.add_argument("--time", "-t", help="Allocation wall time (hours:minutes:seconds) the recommended allocation must fit", type=str, default=None)
     parser.add_argument("--dry_run", "-dry", help="Provide a print-out for the structures to be run", action='store_true')
 
     # Parse arguments and run function
@@ -35,12 +47,14 @@ def main():
     execute_Flux(args)
     return
 
-def get_total_gpus(rmg_input_root):
+def get_total_gpus(rmg_input_root, sh_files=None):
     nodes = False
     gpus_per_node = False
 
+    if sh_files is None:
+        sh_files = Submitter.find_files(rmg_input_root, '.sh')
     try:
-        sh_file = Submitter.find_files(rmg_input_root, '.sh')[0]
+        sh_file = sh_files[0]
     except IndexError:
         print(f'No .sh file in {rmg_input_root}')
         return None
@@ -66,21 +80,42 @@ def get_total_gpus(rmg_input_root):
     else:
         print(f'Found NNODES={nodes} and found GPUS_PER_NODE={gpus_per_node}; check .sh file in {rmg_input_root}!')
         return None
-    
+
+def predict_runtime(rmg_input, cost_model, expected_scf_steps):
+    """
+    Predicted seconds for expected_scf_steps SCF steps of rmg_input on its processor_grid, or None
+    if the grids are missing or a valence is unknown.
+    """
+    keywords = rmg_input.keywords
+    if any(k not in keywords for k in ('processor_grid', 'wavefunction_grid', 'kpoint_mesh')):
+        return None
+    total_electrons = rmg_input.valence_electrons()
+    if total_electrons is None:
+        return None
+    gpus = int(np.prod([int(p) for p in keywords['processor_grid'].split()]))
+    return cost_model.predict_step_time(features_from_keywords(keywords, total_electrons), gpus) * expected_scf_steps
+
 def execute_Flux(args):
-    rmg_roots, rmg_input_paths, total_gpus_lst = [], [], []
+    if args.cost_model:
+        cost_model = AnalyticCostModel.load(args.cost_model)
+    else:
+        cost_model = AnalyticCostModel()
+
+    rmg_roots, rmg_input_paths, total_gpus_lst, runtimes = [], [], [], []
 
     abs_rmg_inputs_directory = os.path.abspath(args.parent_directory)
-    for root, _, _ in os.walk(abs_rmg_inputs_directory):
+    for run_directory in scan_tree(abs_rmg_inputs_directory, (args.rmg_name, 'forcefield.xml')):
+        root = run_directory.path
         append_path = False
         rmg_input_path = os.path.join(root, args.rmg_name)
-        if os.path.exists(rmg_input_path):
-            rmg_input = RMGInput(input_file=rmg_input_path)
+        if args.rmg_name in run_directory:
             forcefield_path = os.path.join(root, 'forcefield.xml')
             
-            total_gpus = get_total_gpus(root)
+            total_gpus = get_total_gpus(root, run_directory.scripts('.sh'))
             if total_gpus:
-                if os.path.exists(forcefield_path):
+                # Parsed once in full: the convergence check reads its keywords, the runtime prediction its species
+                rmg_input = RMGInput(input_file=rmg_input_path)
+                if 'forcefield.xml' in run_directory:
                     forcefield = Forcefield(forcefield_path)
                     convergence_checker = RMGConvergence(rmg_input=rmg_input, forcefield=forcefield)
                     if not convergence_checker.is_converged():
@@ -91,50 +126,81 @@ def execute_Flux(args):
             rmg_roots.append(root)
             rmg_input_paths.append(rmg_input_path)
             total_gpus_lst.append(total_gpus)
+            runtime = predict_runtime(rmg_input, cost_model, args.expected_scf_steps)
+            if runtime is None:
+                print(f'No runtime prediction for {rmg_input_path}; packing it as the longest task')
+            runtimes.append(runtime)
+
+    if not rmg_roots:
+        print(f'No unconverged RMG jobs found in {abs_rmg_inputs_directory}')
+        return
+
+    # Tasks without a prediction are packed as if they ran as long as the longest predicted task
+    known = [r for r in runtimes if r is not None]
+    runtimes = [r if r is not None else max(known, default=1.0) for r in runtimes]
+
+    walltime = parse_walltime(args.time) if args.time else None
+    allocation_nodes = args.allocation_nodes
+    if not allocation_nodes and os.environ.get('SLURM_NNODES'):
+        allocation_nodes = int(os.environ['SLURM_NNODES']) - 1  # One node runs Flux resource management
+    plan = None
+    if allocation_nodes:
+        try:
+            plan = pack_tasks(total_gpus_lst, runtimes, allocation_nodes, args.gpus_per_node)
+        except ValueError as e:
+            # The plan only orders tasks; Flux still gets every task, so fall back to largest first
+            print(f'Cannot plan tasks on {allocation_nodes} nodes ({e}); ordering tasks by GPUs instead')
+    else:
+        allocation_nodes, plan = recommend_allocation(total_gpus_lst, runtimes, args.gpus_per_node, walltime)
+    order = plan['order'] if plan else sorted(range(len(rmg_roots)), key=lambda i: total_gpus_lst[i], reverse=True)
+
+    if args.dry_run:
+        print(f'Printing all RMG directories to run in planned start order...\n')
+        if plan:
+            for line in format_plan(plan, rmg_input_paths, total_gpus_lst):
+                print(line)
+        else:
+            for position, i in enumerate(order):
+                print(f'Task ID: {position}, Path: {rmg_input_paths[i]}, Task GPUs: {total_gpus_lst[i]}')
+            print(f'\nTotal GPUs = {sum(total_gpus_lst)}. Do not forget to request 1 additional node for resource management!')
+            return
+        print(f'Total GPUs = {sum(total_gpus_lst)}. Request -N {allocation_nodes + 1} to include 1 node for resource management!')
+        return 
+
+    # Order tasks by their planned start so the largest, longest tasks launch first and short ones backfill
+    total_gpus_lst = [total_gpus_lst[i] for i in order]
+    rmg_roots = [rmg_roots[i] for i in order]
+    rmg_input_paths = [rmg_input_paths[i] for i in order]
 
-    # Sort so that the most resource-intensive are first
-    zipped_lists = zip(total_gpus_lst, rmg_roots, rmg_input_paths)
-    sorted_zipped_lists = sorted(zipped_lists, key=lambda x: x[0], reverse=True)
-    total_gpus_lst, rmg_roots, rmg_input_paths = zip(*sorted_zipped_lists)
-    total_gpus_lst, rmg_roots, rmg_input_paths = list(total_gpus_lst), list(rmg_roots), list(rmg_input_paths)
-  
     task_list = list(np.arange(len(rmg_roots)))
     tasks_per_job = np.array(total_gpus_lst)
 
-    if args.dry_run:
-        total_gpus = 0
-        print(f'Printing all RMG directories to run...\n')
-        for i in task_list:
-            print(f'Task ID: {task_list[i]}, Path: {rmg_input_paths[i]}, Task GPUs: {total_gpus_lst[i]}')
-            total_gpus += total_gpus_lst[i]
-        print(f'\nTotal GPUs = {total_gpus}. Do not forget to request 1 additional node for resource management!')
-        return 
+    # Now instantiate a task_manager object, which is a Superflux Manager sitting on top of evey smaller Fluxlets
+    # This requires an installation of matensemble
 
-    else:
-        # Now instantiate a task_manager object, which is a Superflux Manager sitting on top of evey smaller Fluxlets
-        # This requires an installation of matensemble
+    import pandas as pd
 
-        job_record = pd.DataFrame({'Task id': task_list,
-        'Task path': rmg_roots
-        })
-        job_record.to_csv('job_record.txt', sep=' ', index=None)
+    job_record = pd.DataFrame({'Task id': task_list,
+    'Task path': rmg_roots
+    })
+    job_record.to_csv('job_record.txt', sep=' ', index=None)
 
-        from matensemble.matfluxGen import SuperFluxManager
+    from matensemble.matfluxGen import SuperFluxManager
 
-        master = SuperFluxManager(task_list, 
-                              args.rmg_executable, 
-                              None,
-                              tasks_per_job=tasks_per_job, 
-                              cores_per_task=args.cores_per_task,
-                              gpus_per_task=args.gpus_per_task, 
-                              write_restart_freq=args.write_restart_freq)
+    master = SuperFluxManager(task_list, 
+                          args.rmg_executable, 
+                          None,
+                          tasks_per_job=tasks_per_job, 
+                          cores_per_task=args.cores_per_task,
+                          gpus_per_task=args.gpus_per_task, 
+                          write_restart_freq=args.write_restart_freq)
 
-        # finally execute the whole pool of tasks
-        master.poolexecutor(task_arg_list=rmg_input_paths, 
-                        buffer_time=1, 
-                        task_dir_list=rmg_roots)
+    # finally execute the whole pool of tasks
+    master.poolexecutor(task_arg_list=rmg_input_paths, 
+                    buffer_time=1, 
+                    task_dir_list=rmg_roots)
 
-        return 
+    return 
 
 if __name__ == '__main__':
     main()
@@ -1,6 +1,10 @@
+import os
 import random 
 import math
+import json
+import sqlite3
 import itertools
+import functools
 import numpy as np
 
 def get_min_middle_max_indices(values):
@@ -76,34 +80,11 @@ def find_best_divisible_combination(grid_values, initial_grid, combinations,
   
     return best_combo, best_value if best_value != float('inf') else None
 
-def get_processor_grid(grid_values, target_nodes, gpus_per_node=8, kpoint_distribution=1, grid_divisibility_exponent=3, fix_nodes=False):
-    """
-    Determine the optimal processor grid distribution given grid values and constraints.
-
-    :param grid_values: 3D grid values representing x, y, and z processor grid densities.
-    :param target_nodes: Total number of desired nodes.
-    :param gpus_per_node: Number of GPUs per node.
-    :param kpoint_distribution: How to distribute over kpoints.
-    :param grid_divisibility_exponent: Exponential factor for grid divisibility. 
-    :return: Optimal processor grid as a string and required number of nodes.
-    """
-    # Normalize grid values based on the smallest grid size and gpus_per_node
-    normalized_grid = np.array(grid_values) / np.min(grid_values)
-    scaling_factor = math.ceil(np.prod(normalized_grid) / gpus_per_node)
-    renormalized_grid = np.array([math.ceil(g / scaling_factor) for g in normalized_grid])
-    min_idx, mid_idx, max_idx = get_min_middle_max_indices(renormalized_grid)
-
-    # Set the upper limit for the lowest processor grid dimension
-    max_grid_factor = int(np.ceil((target_nodes * gpus_per_node) ** (1/3)))
-    
-    # Initialize starting processor grid
-    best_processor_grid = np.floor(renormalized_grid).astype(int)
-    best_function_value = float('inf')
-    
+def generate_factor_shifts(renormalized_grid, max_idx, mid_idx, max_grid_factor):
+    """Yield (candidate_grid, max_shifts, mid_shifts, min_shifts) from max_grid_factor down to 1."""
     while max_grid_factor > 0:
         # Generate candidate grid by scaling normalized grid
         candidate_grid = np.round(renormalized_grid * max_grid_factor).astype(int)
-        total_gpus = np.prod(candidate_grid)
         max_shift_factor = int(np.ceil((max_grid_factor / 2) * np.ceil(renormalized_grid[max_idx])))
 
         # Generate possible shifts for GPU allocation
@@ -111,6 +92,16 @@ def get_processor_grid(grid_values, target_nodes, gpus_per_node=8, kpoint_distri
         mid_shifts = generate_gpu_mapping(candidate_grid[mid_idx], max_shift_factor)
         min_shifts = np.array([-1, 0, 1])  # Small adjustments
 
+        yield candidate_grid, max_shifts, mid_shifts, min_shifts
+        max_grid_factor -= 1  # Reduce search space
+
+def loop_search(grid_values, renormalized_grid, min_idx, mid_idx, max_idx, max_grid_factor,
+                target_nodes, gpus_per_node, grid_divisibility_exponent, fix_nodes):
+    """Candidate-by-candidate search; returns the best grid as a list or None."""
+    best_processor_grid, best_function_value = None, float('inf')
+
+    for candidate_grid, max_shifts, mid_shifts, min_shifts in generate_factor_shifts(
+            renormalized_grid, max_idx, mid_idx, max_grid_factor):
         # Generate all possible shift combinations
         combinations = itertools.product(max_shifts, mid_shifts, min_shifts)
 
@@ -123,7 +114,152 @@ def get_processor_grid(grid_values, target_nodes, gpus_per_node=8, kpoint_distri
         # Update best configuration if improvement is found
         if best_value is not None and best_value < best_function_value:
             best_processor_grid, best_function_value = best_combo, best_value
-        max_grid_factor -= 1  # Reduce search space
+
+    return best_processor_grid
+
+def vectorized_search(grid_values, renormalized_grid, min_idx, mid_idx, max_idx, max_grid_factor,
+                      target_nodes, gpus_per_node, grid_divisibility_exponent, fix_nodes,
+                      alpha=0.2, beta=0.1, tolerance=1e-1):
+    """
+    Evaluates every candidate of every grid factor as one (N, 3) array.
+
+    Candidates are laid out in the same order as loop_search visits them and the first
+    minimum is taken, so ties resolve identically and the chosen grid is the same.
+    """
+    candidates = []
+    for candidate_grid, max_shifts, mid_shifts, min_shifts in generate_factor_shifts(
+            renormalized_grid, max_idx, mid_idx, max_grid_factor):
+        shifts = np.meshgrid(max_shifts, mid_shifts, min_shifts, indexing='ij')
+        adjustment = np.zeros((shifts[0].size, 3), dtype=int)
+        adjustment[:, max_idx] = shifts[0].ravel()
+        adjustment[:, mid_idx] = shifts[1].ravel()
+        adjustment[:, min_idx] = shifts[2].ravel()
+        candidates.append(candidate_grid + adjustment)
+    if not candidates:
+        return None
+
+    modified_grids = np.concatenate(candidates)
+    total_gpus = np.prod(modified_grids, axis=1)
+
+    valid = np.all(modified_grids != 0, axis=1)
+    valid &= total_gpus % (2**grid_divisibility_exponent) == 0
+    if fix_nodes == True:
+        # Check that the solved gpus can be mapped to the target nodes
+        valid &= ~(total_gpus / gpus_per_node > target_nodes)
+    if not valid.any():
+        return None
+
+    modified_grids, total_gpus = modified_grids[valid], total_gpus[valid]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.std(np.array(grid_values) / modified_grids, axis=1)
+        target_gpus = target_nodes * gpus_per_node
+        penalty = np.where(total_gpus < target_gpus, alpha, beta) * (np.abs(total_gpus - target_gpus) / target_gpus)
+        weighted_values = penalty * np.maximum(sigma, tolerance)  # Prevent zero sigma issues
+
+    finite = weighted_values < np.inf  # NaN and inf never beat the starting value
+    if not finite.any():
+        return None
+    best = np.flatnonzero(finite)[np.argmin(weighted_values[finite])]
+    return modified_grids[best].tolist()
+
+# Smallest per-GPU domain edge, in grid points, that still holds a finite-difference halo
+MIN_DOMAIN_POINTS = 4
+
+def divisors(value):
+    small = [d for d in range(1, math.isqrt(value) + 1) if value % d == 0]
+    return sorted(set(small + [value // d for d in small]))
+
+def factor_triples(total, max_factors=None):
+    """All ordered (px, py, pz) with px * py * pz == total and each factor within max_factors, as an (N, 3) array."""
+    max_x, max_y, max_z = max_factors if max_factors is not None else (total, total, total)
+    triples = [(px, py, total // (px * py))
+               for px in divisors(total) if px <= max_x
+               for py in divisors(total // px) if py <= max_y and total // (px * py) <= max_z]
+    return np.array(triples, dtype=int).reshape(-1, 3)
+
+def divisor_search(grid_values, renormalized_grid, min_idx, mid_idx, max_idx, max_grid_factor,
+                   target_nodes, gpus_per_node, grid_divisibility_exponent, fix_nodes,
+                   alpha=0.2, beta=0.1, halo_weight=0.5):
+    """
+    Scores every exact px * py * pz factorization of whole-node GPU counts.
+
+    Node counts span target_nodes/2..target_nodes when fix_nodes is set and
+    target_nodes/2..2*target_nodes otherwise; the halo term favours fewer GPUs, so a wider
+    range would let awkward-to-factor targets collapse onto a handful of nodes. Each decomposition is scored by its per-GPU load imbalance (largest domain
+    over the ideal share, minus one), its halo cost (domain surface-to-volume ratio) and
+    its distance from the target GPU count, weighted as in weighting_function. Falls back to
+    vectorized_search when no node count in range can be decomposed.
+    """
+    grid = np.array(grid_values, dtype=int)
+    target_gpus = target_nodes * gpus_per_node
+    if fix_nodes == True:
+        node_counts = range(max(1, int(np.floor(target_nodes / 2))), max(1, int(np.floor(target_nodes))) + 1)
+    else:
+        node_counts = range(max(1, int(np.floor(target_nodes / 2))), max(1, int(np.ceil(target_nodes * 2))) + 1)
+
+    max_factors = grid // MIN_DOMAIN_POINTS
+    best_processor_grid, best_value = None, float('inf')
+    for nodes in sorted(node_counts, key=lambda n: abs(n * gpus_per_node - target_gpus)):
+        total_gpus = nodes * gpus_per_node
+        if total_gpus % (2**grid_divisibility_exponent) != 0:
+            continue
+        deviation = (alpha if total_gpus < target_gpus else beta) * abs(total_gpus - target_gpus) / target_gpus
+        if deviation >= best_value:  # Imbalance and halo terms are non-negative
+            continue
+        triples = factor_triples(total_gpus, max_factors)
+        if not len(triples):
+            continue
+
+        domains = -(-grid // triples)  # Ceiling division: the largest per-GPU domain along each axis
+        imbalance = np.prod(domains, axis=1) * total_gpus / np.prod(grid) - 1
+        surface_to_volume = 2 * np.sum(1 / domains, axis=1)
+        values = imbalance + halo_weight * surface_to_volume + deviation
+
+        best = np.argmin(values)
+        if values[best] < best_value or (values[best] == best_value and total_gpus < np.prod(best_processor_grid)):
+            best_processor_grid, best_value = triples[best].tolist(), values[best]
+
+    if best_processor_grid is None:
+        # No whole-node count in range factors into domains large enough; use the heuristic
+        return vectorized_search(grid_values, renormalized_grid, min_idx, mid_idx, max_idx, max_grid_factor,
+                                 target_nodes, gpus_per_node, grid_divisibility_exponent, fix_nodes)
+    return best_processor_grid
+
+SEARCH_ENGINES = {'vectorized': vectorized_search, 'loop': loop_search, 'divisor': divisor_search}
+
+def solve_processor_grid(grid_values, target_nodes, gpus_per_node=8, kpoint_distribution=1, grid_divisibility_exponent=3, fix_nodes=False,
+                         engine='vectorized'):
+    """
+    Determine the optimal processor grid distribution given grid values and constraints.
+    Always searches; get_processor_grid is the memoized entry point.
+
+    :param grid_values: 3D grid values representing x, y, and z processor grid densities.
+    :param target_nodes: Total number of desired nodes.
+    :param gpus_per_node: Number of GPUs per node.
+    :param kpoint_distribution: How to distribute over kpoints.
+    :param grid_divisibility_exponent: Exponential factor for grid divisibility. 
+    :param engine: 'vectorized' (default) or 'loop' run the shifted-grid heuristic and return the same grid;
+                   'divisor' picks an exact factorization of whole-node GPU counts by load balance and halo cost.
+    :return: Optimal processor grid as a string and required number of nodes.
+    """
+    if engine not in SEARCH_ENGINES:
+        raise ValueError(f'Unknown processor grid engine {engine}; choose from {", ".join(SEARCH_ENGINES)}')
+
+    # Normalize grid values based on the smallest grid size and gpus_per_node
+    normalized_grid = np.array(grid_values) / np.min(grid_values)
+    scaling_factor = math.ceil(np.prod(normalized_grid) / gpus_per_node)
+    renormalized_grid = np.array([math.ceil(g / scaling_factor) for g in normalized_grid])
+    min_idx, mid_idx, max_idx = get_min_middle_max_indices(renormalized_grid)
+
+    # Set the upper limit for the lowest processor grid dimension
+    max_grid_factor = int(np.ceil((target_nodes * gpus_per_node) ** (1/3)))
+
+    best_processor_grid = SEARCH_ENGINES[engine](grid_values, renormalized_grid, min_idx, mid_idx, max_idx,
+                                                 max_grid_factor, target_nodes, gpus_per_node,
+                                                 grid_divisibility_exponent, fix_nodes)
+    if best_processor_grid is None:
+        # Fall back to the starting processor grid
+        best_processor_grid = np.floor(renormalized_grid).astype(int)
 
     # Compute required number of nodes
     total_nodes = math.ceil(np.prod(best_processor_grid) / gpus_per_node)
@@ -131,3 +267,71 @@ def get_processor_grid(grid_values, target_nodes, gpus_per_node=8, kpoint_distri
 
     return ' '.join(map(str, best_processor_grid)), total_nodes
 
+# Optional on-disk table of solved grids shared between runs and processes
+PERSISTENT_CACHE_PATH = None
+# Part of every persistent key; bump when a search engine's choices change so stale grids are not reused
+SOLVER_VERSION = 2
+persistent_cache_counters = {'persistent_hits': 0, 'persistent_misses': 0}
+
+def set_persistent_cache(path):
+    """Enables the SQLite processor grid table at path, or disables it with None."""
+    global PERSISTENT_CACHE_PATH
+    PERSISTENT_CACHE_PATH = os.path.abspath(os.path.expanduser(path)) if path else None
+    if PERSISTENT_CACHE_PATH:
+        os.makedirs(os.path.dirname(PERSISTENT_CACHE_PATH), exist_ok=True)
+        with sqlite3.connect(PERSISTENT_CACHE_PATH, timeout=30) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS processor_grids '
+                               '(key TEXT PRIMARY KEY, processor_grid TEXT, nodes INTEGER)')
+
+def _read_persistent(key):
+    try:
+        with sqlite3.connect(PERSISTENT_CACHE_PATH, timeout=30) as connection:
+            return connection.execute('SELECT processor_grid, nodes FROM processor_grids WHERE key = ?',
+                                      (key,)).fetchone()
+    except sqlite3.Error:
+        return None  # An unavailable table only costs a re-solve
+
+def _write_persistent(key, result):
+    try:
+        with sqlite3.connect(PERSISTENT_CACHE_PATH, timeout=30) as connection:
+            connection.execute('INSERT OR REPLACE INTO processor_grids VALUES (?, ?, ?)', (key, *result))
+    except sqlite3.Error:
+        pass
+
+@functools.lru_cache(maxsize=4096)
+def _memoized_processor_grid(arguments):
+    if PERSISTENT_CACHE_PATH is None:
+        return solve_processor_grid(list(arguments[0]), *arguments[1:])
+
+    key = json.dumps([SOLVER_VERSION, *arguments])
+    stored = _read_persistent(key)
+    if stored:
+        persistent_cache_counters['persistent_hits'] += 1
+        return stored[0], int(stored[1])
+
+    persistent_cache_counters['persistent_misses'] += 1
+    result = solve_processor_grid(list(arguments[0]), *arguments[1:])
+    _write_persistent(key, result)
+    return result
+
+def get_processor_grid(grid_values, target_nodes, gpus_per_node=8, kpoint_distribution=1, grid_divisibility_exponent=3, fix_nodes=False,
+                       engine='vectorized'):
+    """
+    Memoized solve_processor_grid, keyed on the full argument tuple.
+
+    Results are kept in an in-process LRU and, after set_persistent_cache(path), in an
+    SQLite table shared across runs. Hit and miss counts are in processor_grid_cache_info().
+    """
+    arguments = (tuple(int(g) for g in grid_values), float(target_nodes), int(gpus_per_node),
+                 int(kpoint_distribution), int(grid_divisibility_exponent), bool(fix_nodes), engine)
+    return _memoized_processor_grid(arguments)
+
+def processor_grid_cache_info():
+    """In-process LRU hits/misses plus persistent table hits/misses for the current process."""
+    info = _memoized_processor_grid.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+            'persistent_path': PERSISTENT_CACHE_PATH, **persistent_cache_counters}
+
+def clear_processor_grid_cache():
+    _memoized_processor_grid.cache_clear()
+    persistent_cache_counters.update(persistent_hits=0, persistent_misses=0)
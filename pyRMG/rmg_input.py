@@ -1,19 +1,33 @@
 import yaml
-import re
 import json
 import os
 import sys
+import copy
 import math
-from pymatgen.core import Structure
+import operator
+import functools
 import numpy as np
 from pyRMG.valence import ONCVValences, GeneralValences
 from pyRMG.processor_grid import get_processor_grid
+from pyRMG.cost_model import features_from_keywords
 
 # Conversion factor from Bohr to Angstrom
 BOHR_TO_ANGSTROM = 0.529177
 
+@functools.lru_cache(maxsize=64)
+def _parse_yaml(yaml_path, size, mtime_ns):
+    with open(yaml_path, 'r') as f:
+        return yaml.safe_load(f)
+
+def load_yaml(yaml_path):
+    """yaml.safe_load of yaml_path, parsed once per version of the file; returns a copy the caller may modify."""
+    yaml_path = os.path.abspath(yaml_path)
+    stat = os.stat(yaml_path)
+    return copy.deepcopy(_parse_yaml(yaml_path, stat.st_size, stat.st_mtime_ns))
+
 class RMGInput:
-    def __init__(self, structure: Structure = None, site_params: dict = None, keywords: dict = None, input_file: str = None, target_nodes: int = 0):
+    def __init__(self, structure: "Structure" = None, site_params: dict = None, keywords: dict = None, input_file: str = None, target_nodes: int = 0,
+                 header_only: bool = False):
         """
         Initialize the RMGInput class.
 
@@ -21,13 +35,17 @@ class RMGInput:
         - structure (pymatgen.core.Structure): Structure object defining the system.
         - keywords (dict): Dictionary of settings (likely from a .yml file).
         - input_file (str): Path to an existing rmg_input file (if reading from a file).
+        - header_only (bool): Only read the keywords of input_file, skipping its lattice/atoms blocks;
+          structure and site_params are then None.
         """
         self.target_nodes = target_nodes
+        self._structure = None
+        self._sites = None  # (lattice, species, coords, coords_are_cartesian) until .structure is built
 
         if input_file:
             # Load from an existing file
             try:
-                self._load_from_file(input_file)
+                self._load_from_file(input_file, header_only)
             except ValueError:
                 print(f'Cannot generate structure, keywords, and site_params from {input_file}')
                 sys.exit(1)
@@ -39,13 +57,135 @@ class RMGInput:
         else:
             raise ValueError("Must provide either input_file or (structure and keywords).")
 
-    def _load_from_file(self, input_file: str):
+    @property
+    def structure(self):
+        """pymatgen Structure of the input, built from the parsed arrays on first access."""
+        if self._structure is None and self._sites is not None:
+            from pymatgen.core import Structure
+            lattice, species, coords, coords_are_cartesian = self._sites
+            self._structure = Structure(lattice, species, coords, coords_are_cartesian=coords_are_cartesian)
+            self._sites = None
+        return self._structure
+
+    @structure.setter
+    def structure(self, structure):
+        self._structure, self._sites = structure, None
+
+    @property
+    def species(self):
+        """Element symbol of every site, without building the Structure."""
+        if self._sites is not None:
+            return list(self._sites[1])
+        return [str(specie) for specie in self._structure.species] if self._structure is not None else []
+
+    def site_properties(self):
+        """site_params as per-site lists, the form Structure.add_site_property takes."""
+        return {key: value.tolist() if isinstance(value, np.ndarray) else list(value)
+                for key, value in self.site_params.items()}
+
+    def _load_from_file(self, input_file: str, header_only: bool = False):
         """Loads an existing RMG input file."""
+        if header_only:
+            self.site_params, self.keywords = None, self.read_keywords(input_file)
+            return
+
         with open(input_file, "r") as f:
             lines = f.readlines()
 
         # Process input file contents (this part depends on the RMG input format)
-        self.structure, self.site_params, self.keywords = self._parse_rmg_input(lines)
+        self._sites, self.site_params, self.keywords = self._parse_rmg_input(lines)
+
+    @staticmethod
+    def _keyword_line(line):
+        """(key, value, closed) of a 'key = "value"' entry, or None; closed is False if the value continues on later lines."""
+        key, separator, value = line.partition('=')
+        key, value = key.rstrip(), value.lstrip()
+        if not separator or not key or not key.replace('_', '').isalnum() or not value.startswith('"'):
+            return None
+        end = value.find('"', 1)
+        if end < 0:
+            return key, value[1:].strip(), False
+        return key, value[1:end].rstrip(), True
+
+    @classmethod
+    def _entries(cls, lines, skip_blocks=False):
+        """
+        (key, value) of every keyword in the lines of an rmg_input file.
+
+        The lattice_vector and atoms blocks end at an empty, comment or quote line; other quoted
+        values, such as a pseudopotential map, may span lines up to their closing quote. With
+        skip_blocks the lattice_vector and atoms blocks are passed over without being collected.
+        """
+        block_key, block_lines = None, []
+        quoted_key, quoted_lines = None, []
+        for line in lines:
+            line = line.strip()
+            if quoted_key:
+                part, quote, _ = line.partition('"')
+                quoted_lines.append(part.rstrip())
+                if quote:
+                    yield quoted_key, '\n'.join(part for part in quoted_lines if part)
+                    quoted_key = None
+            elif not line or line[0] in '#"':
+                if block_key and not skip_blocks:
+                    yield block_key, '\n'.join(block_lines).replace('"', '').strip()
+                block_key, block_lines = None, []
+            elif line.startswith(("lattice_vector", "atoms")):
+                block_key = line.split("=")[0].strip()  # Get the key (e.g., "lattice_vector")
+                block_lines.append(line.split("=")[1])
+            elif block_key:
+                if not skip_blocks:
+                    block_lines.append(line)
+            else:
+                entry = cls._keyword_line(line)
+                if entry and entry[2]:
+                    yield entry[0], entry[1]
+                elif entry:
+                    quoted_key, quoted_lines = entry[0], [entry[1]]
+
+    @classmethod
+    def read_keywords(cls, input_file: str) -> dict:
+        """
+        Keywords of an rmg_input file without parsing its lattice_vector and atoms blocks.
+
+        Block bodies are skipped line by line with the same termination rules as
+        _parse_rmg_input, so keywords placed after a block are still found. This is all
+        that status checks such as RMGConvergence need.
+        """
+        with open(input_file, "r") as f:
+            keywords = dict(cls._entries(f, skip_blocks=True))
+        for key in ('bravais_lattice_type', 'crds_units', 'lattice_units', 'atomic_coordinate_type'):
+            keywords.pop(key, 0)
+        return keywords
+
+    @staticmethod
+    def _parse_atoms(atoms_text):
+        """
+        Species, coordinates, selective dynamics and magnetic moments of an atoms block.
+
+        Blocks whose rows are single-space separated with equal field counts, as written by
+        RMGInput.save, are split once and converted column-wise; other blocks fall back to
+        row-by-row conversion. Selective dynamics is an (n, 3) bool array; magnetic moments are
+        an (n, m) float array, or a list of lists if rows differ in length.
+        """
+        lines = [line for line in atoms_text.split("\n") if line]
+        fields = len(lines[0].split()) if lines else 0
+        if fields >= 7 and '\t' not in atoms_text and '  ' not in atoms_text and all(line.count(' ') == fields - 1 for line in lines):
+            values = ' '.join(lines).split()
+            columns = [values[i::fields] for i in range(fields)]
+            species = columns[0]
+            coords = np.array(columns[1:4], dtype=float).T
+            selective_dynamics = (np.array(columns[4:7]) == "1").T
+            magnetic_properties = np.array(columns[7:], dtype=float).reshape(fields - 7, len(lines)).T
+        else:
+            rows = [line.split() for line in lines]
+            species = [row[0] for row in rows]
+            coords = np.array([[float(x) for x in row[1:4]] for row in rows])
+            selective_dynamics = np.array([[row[i] == "1" for i in range(4, 7)] for row in rows], dtype=bool).reshape(-1, 3)
+            magnetic_properties = [[float(row[i]) for i in range(7, len(row))] for row in rows]
+            if len({len(mag) for mag in magnetic_properties}) == 1:
+                magnetic_properties = np.array(magnetic_properties)
+        return species, coords, selective_dynamics, magnetic_properties
 
     def _parse_rmg_input(self, lines):
         """
@@ -55,94 +195,48 @@ class RMGInput:
         - lines (list of str): Lines from the input file.
 
         Returns:
-        - structure (pymatgen Structure or None): Parsed structure, if available.
+        - sites (tuple): (lattice, species, coords, coords_are_cartesian) to build the Structure from.
+        - site_params (dict): Selective dynamics and magnetic moment arrays.
         - keywords (dict): Dictionary of input settings.
         """
-        keywords = {}
-        structure_params = {
-            "lattice_vectors": [],
-            "atomic_positions": [],
-            "atomic_coordinate_type": None,
-            "crds_units": None,
-            "bravais_lattice_type": None,
-        }
         site_params = {
             "selective_dynamics": [], 
             "magnetic_properties": [], 
         }
-        current_key = None  # Tracks ongoing multi-line values
-        multiline_buffer = []  # Stores accumulated lines for multi-line values
-        
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith("#") or line.startswith('"'):  # Skip empty lines and comments
-                if current_key and multiline_buffer:
-                    keywords[current_key] = '\n'.join(multiline_buffer).replace('"', '').strip()
-                current_key = None
-                multiline_buffer = []
-            elif any(line.startswith(k) for k in ["lattice_vector", "atoms"]):
-                current_key = line.split("=")[0].strip()  # Get the key (e.g., "lattice_vector")
-                multiline_buffer.append(line.split("=")[1])
-            elif current_key and multiline_buffer:
-                multiline_buffer.append(line)
-            else:
-                match = re.match(r'(\w+)\s*=\s*"([^"]*)"', line)
-                if match:
-                    key, value = match.groups()
-                    # Store normal key-value pairs
-                    keywords[key] = value.rstrip()
-
-                    # Store relevant structure parameters
-                    if key in structure_params:
-                        structure_params[key] = value.rstrip()
+        keywords = dict(self._entries(lines))
 
         # Determine if conversion from Bohr to Angstrom is needed
         conversion_factor = 1.0  # Default (Angstrom)
-        if structure_params["crds_units"] == "Bohr":
+        if keywords.get("crds_units") == "Bohr":
             conversion_factor = BOHR_TO_ANGSTROM
 
         # Convert lattice vectors if present
+        lattice_vectors = []
         if "lattice_vector" in keywords:
-            structure_params["lattice_vectors"] = np.array([
+            lattice_vectors = np.array([
                 list(map(float, line.strip('"').split())) for line in keywords["lattice_vector"].split("\n") if line
             ]) * conversion_factor  # Apply unit conversion
 
-        # Convert atomic positions if present
-        if "atoms" in keywords:
-            structure_params["atomic_positions"] = [
-                line.strip('"').split() for line in keywords["atoms"].split("\n") if line
-            ]
-
-        # Build pymatgen Structure if possible
-        structure = None
-        if structure_params["lattice_vectors"] is not [] and structure_params["atomic_positions"] is not []:
-            species = [atom[0] for atom in structure_params["atomic_positions"]]
-            coords = np.array([[float(x) for x in atom[1:4]] for atom in structure_params["atomic_positions"]])
-            site_params['selective_dynamics'] = [[atom[i] == "1" for i in range(4, 7)] for atom in structure_params["atomic_positions"]]
-            site_params['magnetic_properties'] = [[float(atom[i]) for i in range(7, len(atom))] for atom in structure_params["atomic_positions"]]
-            coords *= conversion_factor  # Apply unit conversion to atomic positions
-            
-            # Set coords_are_cartesian
-            if structure_params["atomic_coordinate_type"] == "Absolute":
-                coords_are_cartesian = True
-            else:
-                coords_are_cartesian = False
-
-            structure = Structure(
-                structure_params["lattice_vectors"], species, coords,
-                coords_are_cartesian=coords_are_cartesian
-            )
+        # Arrays of the atoms block; the Structure is built from them on first use
+        species, coords, site_params['selective_dynamics'], site_params['magnetic_properties'] = self._parse_atoms(keywords.get("atoms", ""))
+        coords *= conversion_factor  # Apply unit conversion to atomic positions
         
+        # Set coords_are_cartesian
+        coords_are_cartesian = keywords.get("atomic_coordinate_type") == "Absolute"
+
+        sites = (lattice_vectors, species, coords, coords_are_cartesian)
+
         # Remove the structure-specific keys from the keywords dictionary
         for key in ('atoms', 'lattice_vector', 'bravais_lattice_type', 'crds_units', 'lattice_units', 'atomic_coordinate_type'):
             keywords.pop(key, 0)
 
-        return structure, site_params, keywords
+        return sites, site_params, keywords
 
     def save(self, filename: str):
         """Writes the RMG input file from the current structure and settings."""
         with open(filename, "w") as f:
-            f.write(self._generate_rmg_input())
+            for block in self._rmg_input_blocks():
+                f.write(block)
 
     def _generate_rmg_input(self) -> str:
         """
@@ -151,40 +245,75 @@ class RMGInput:
         Returns:
         - str: Formatted input file content.
         """
-        writelines = ""
-        for key in sorted(self.keywords.keys()):
-            writelines += f'{key} = "{self.keywords[key]}"\n'
-        writelines += '\n'
-
-        writelines += f'atomic_coordinate_type = "Absolute"\n'
-        writelines += f'crds_units = "Angstrom"\n'
-        writelines += f'lattice_units = "Angstrom"\n\n'
-
-        lattice_vector_lines = 'lattice_vector = "\n'
-        for row in self.structure.lattice.matrix:
-            lattice_vector_lines += ' '.join(f"{f:.12e}" for f in row) + '\n'
-        lattice_vector_lines += '"\n'
-        writelines += lattice_vector_lines
-
-        writelines += f'atoms = "\n'
-        for i, site in enumerate(self.structure):
-            atom_line = ''
-            atom_line += str(site.specie) + ' '
-            atom_line += " ".join(f"{val:.12e}" for val in site.coords) + ' '
-            atom_line += self.site_params['selective_dynamics'][i] + ' '
-            atom_line += self.site_params['magnetic_properties'][i] + '\n'
-            writelines += atom_line
-        writelines += '"'
-
-        return writelines
+        return ''.join(self._rmg_input_blocks())
+
+    def _rmg_input_blocks(self, atoms_per_block=65536):
+        """
+        Yields the RMG input file in consecutive text blocks.
+
+        The atom rows are assembled from whole columns: species names are formatted once per
+        species the sites share, coordinates and array site_params with one %-format per block
+        of atoms, and the columns are joined row-wise without per-site Python code.
+        """
+        yield ''.join(f'{key} = "{self.keywords[key]}"\n' for key in sorted(self.keywords.keys())) + '\n'
+
+        yield ('atomic_coordinate_type = "Absolute"\n'
+               'crds_units = "Angstrom"\n'
+               'lattice_units = "Angstrom"\n\n')
+
+        yield ('lattice_vector = "\n' +
+               ('%.12e %.12e %.12e\n' * 3) % tuple(self.structure.lattice.matrix.ravel().tolist()) +
+               '"\n')
+
+        yield 'atoms = "\n'
+        species = self._species_strings(self.structure)
+        coords = self.structure.cart_coords
+        selective_dynamics = self._site_param_strings(self.site_params['selective_dynamics'])
+        magnetic_properties = self._site_param_strings(self.site_params['magnetic_properties'])
+        for start in range(0, len(species), atoms_per_block):
+            stop = min(start + atoms_per_block, len(species))
+            rows = zip(species[start:stop], self._row_strings(coords[start:stop], '%.12e'),
+                       selective_dynamics[start:stop], magnetic_properties[start:stop])
+            yield '\n'.join(map(' '.join, rows)) + '\n'
+        yield '"'
+
+    @staticmethod
+    def _species_strings(structure):
+        """str(site.specie) of every site, formatted once per species object the sites share."""
+        compositions = list(map(operator.attrgetter('species'), structure))
+        ids = np.fromiter(map(id, compositions), dtype=np.uint64, count=len(compositions))
+        _, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        names = np.array([str(structure[int(i)].specie) for i in first], dtype=str)
+        return names[inverse.ravel()].tolist()
+
+    @staticmethod
+    def _row_strings(array, column_format):
+        """Space-separated column_format strings of the rows of a 2D array, formatted in one pass."""
+        n, columns = array.shape
+        if not n or not columns:
+            return [''] * n
+        row_format = ' '.join([column_format] * columns) + '\n'
+        return ((row_format * n) % tuple(array.ravel().tolist())).split('\n')[:-1]
+
+    @staticmethod
+    def _site_param_strings(values):
+        """Per-site strings of a site_params entry: strings pass through, bools become 1/0."""
+        if isinstance(values, np.ndarray) and values.ndim == 2 and values.dtype != object:
+            return RMGInput._row_strings(np.where(values, '1', '0') if values.dtype == bool else values, '%s')
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        return [value if isinstance(value, str) else
+                ' '.join(('1' if x else '0') if isinstance(x, (bool, np.bool_)) else str(x) for x in value)
+                for value in values]
 
     @classmethod
     def from_yaml(cls, yaml_path, structure_path=None, structure_obj=None, pseudopotentials_directory='', 
-                  magmom_path=None, target_nodes=0, gpus_per_node=8, electrons_per_gpu=10, grid_divisibility_exponent=3):
-        with open(yaml_path, 'r') as f:
-            input_args = yaml.safe_load(f)
+                  magmom_path=None, target_nodes=0, gpus_per_node=8, electrons_per_gpu=10, grid_divisibility_exponent=3,
+                  processor_grid_engine='vectorized', cost_model=None, walltime_seconds=None, expected_scf_steps=200):
+        input_args = load_yaml(yaml_path)
         
         if not structure_obj:
+            from pymatgen.core import Structure
             structure_obj = Structure.from_file(structure_path)
         site_params = {'selective_dynamics': cls._read_selective_dynamics(structure_obj), 
                        'magnetic_properties': cls._read_magnetic_occupancies(structure_obj)}
@@ -265,12 +394,17 @@ class RMGInput:
         # Processor grid generation
         if not 'processor_grid' in input_args:
             fix_nodes = True
-            if not target_nodes:
+            if not target_nodes and cost_model:
+                # Node count per k-point group with the best predicted throughput per node-hour
+                target_nodes = cost_model.choose_nodes(features_from_keywords(input_args, total_electrons),
+                                                       gpus_per_node, walltime_seconds, expected_scf_steps)
+            elif not target_nodes:
                 target_nodes = (total_electrons / (electrons_per_gpu * gpus_per_node))
                 fix_nodes = False
             processor_grid, target_nodes = get_processor_grid([int(g) for g in wavefunction_grid.split()],
                                                               target_nodes, gpus_per_node, kpoint_distribution, 
-                                                              grid_divisibility_exponent, fix_nodes)
+                                                              grid_divisibility_exponent, fix_nodes,
+                                                              engine=processor_grid_engine)
             input_args['processor_grid'] = processor_grid
 
         return cls(structure=structure_obj, keywords=input_args, site_params=site_params, target_nodes=target_nodes)
@@ -285,16 +419,41 @@ class RMGInput:
 
     @staticmethod
     def _sum_electrons(structure, pseudopotentials_directory, pseudo_dct):
-        if pseudopotentials_directory == '': 
+        """Total valence electrons of a Structure or of a list of element symbols."""
+        species = list(structure) if isinstance(structure, (list, tuple)) else [str(site.specie) for site in structure]
+        total_electrons = RMGInput._count_electrons(species, pseudopotentials_directory, pseudo_dct)
+        if total_electrons is None:
+            print(f'Not all elements in {" ".join(sorted(set(species)))} have ONCV pseudopotentials! Exiting...')
+            sys.exit(1)
+        return total_electrons
+
+    @staticmethod
+    def _count_electrons(species, pseudopotentials_directory, pseudo_dct):
+        """Total valence electrons of a list of element symbols, or None if a valence is unknown."""
+        if pseudopotentials_directory == '':
             valence = ONCVValences()
         else:
-            valence = GeneralValences(pseudopotentials_directory, pseudo_dct) 
+            try:
+                valence = GeneralValences(pseudopotentials_directory, pseudo_dct)
+            except KeyError:  # Unreadable pseudopotential of an element without an internal valence
+                return None
+        valences = {specie: valence.get_valence(specie) for specie in set(species)}
+        if None in valences.values():
+            return None
+        return np.sum([valences[specie] for specie in species])
+
+    def valence_electrons(self, pseudopotentials_directory=''):
+        """
+        Total valence electrons of the input's species, or None if a valence is unknown.
+
+        The pseudo_dir and pseudopotential keywords take precedence over pseudopotentials_directory.
+        Unlike from_yaml this never exits, so sweeps over many inputs can skip the ones it fails for.
+        """
         try:
-            total_electrons = np.sum([valence.get_valence(str(site.specie)) for site in structure])
-            return total_electrons
-        except TypeError:
-            print(f'Not all elements in {structure_obj.composition.reduced_formula} have ONCV pseudopotentials! Exiting...')
-            sys.exit(1)
+            pseudo_dct = self._parse_map(self.keywords['pseudopotential']) if 'pseudopotential' in self.keywords else {}
+        except ValueError:
+            return None
+        return self._count_electrons(self.species, self.keywords.get('pseudo_dir', pseudopotentials_directory), pseudo_dct)
 
     @staticmethod
     def _read_selective_dynamics(structure):
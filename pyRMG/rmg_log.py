@@ -1,95 +1,374 @@
 import os
 import glob
+import time
+import collections
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from pymatgen.core import Structure
+from pyRMG.trajectory import RMGTrajectory
+from pyRMG.log_tokenizer import tokenize_line, BASIS_VECTOR, LATTICE, ION, ENERGY, SCF_STEP, TOTAL_TIME
+
+BOHR_FACTOR = 1.8897259886  # Convert Bohr to Angstroms
+RYDBERG_FACTOR = 2
+BOHR_RYDBERG = np.divide(RYDBERG_FACTOR, BOHR_FACTOR)  # Convert forces
+
+class RMGLogParser:
+    """
+    Per-line state machine that groups contiguous @ION records into ionic frames.
+
+    A frame is only emitted once its @ION block is terminated by a non-@ION line,
+    so a block that is still being written at the end of a log is never returned.
+    """
+    def __init__(self):
+        self.lattice = None  # Most recent complete lattice (Bohr)
+        self.partial_lattice = []
+        self.block = []  # (specie, position, force) rows of the open @ION block
+        self.energy = None
+        self.last_record = None  # Kind of the record on the most recently fed line
+        # Set when parsing starts mid-file: lattice rows read before the first @ION block closes
+        # may be the tail of a group cut by the window, so they are dropped at that point
+        self.discard_partial_lattice = False
+
+    def feed(self, line):
+        """Consume a single log line; returns a completed frame dictionary or None."""
+        frame = None
+        if self.block and "@ION" not in line:
+            frame = self._close_block()
+            if self.discard_partial_lattice:
+                self.partial_lattice = []
+                self.discard_partial_lattice = False
+
+        token = tokenize_line(line)
+        if token is None:
+            self.last_record = None
+            return frame
+
+        kind, values = token
+        self.last_record = kind
+        if kind == ION:
+            self.block.append(values)
+        elif kind == ENERGY:
+            self.energy = values
+        elif kind in (BASIS_VECTOR, LATTICE):
+            self._add_lattice_row(values)
+
+        return frame
+
+    def get_state(self):
+        """JSON-serializable copy of the parser state, including any open @ION block."""
+        return {
+            "lattice": None if self.lattice is None else [list(row) for row in self.lattice],
+            "partial_lattice": [list(row) for row in self.partial_lattice],
+            "block": [[specie, list(position), list(force)] for specie, position, force in self.block],
+            "energy": self.energy,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        parser = cls()
+        parser.lattice = state["lattice"]
+        parser.partial_lattice = [list(row) for row in state["partial_lattice"]]
+        parser.block = [tuple(row) for row in state["block"]]
+        parser.energy = state["energy"]
+        return parser
+
+    def parse(self, lines):
+        """Generator yielding completed frames from an iterable of lines."""
+        for line in lines:
+            frame = self.feed(line)
+            if frame is not None:
+                yield frame
+
+    def _add_lattice_row(self, row):
+        self.partial_lattice.append(row)
+        if len(self.partial_lattice) == 3:
+            self.lattice = self.partial_lattice
+            self.partial_lattice = []
+
+    def _close_block(self):
+        block, energy = self.block, self.energy
+        self.block, self.energy = [], None
+        if self.lattice is None:  # Positions cannot be placed without a cell
+            return None
+
+        species = [row[0] for row in block]
+        return {
+            "lattice": np.divide(np.array(self.lattice), BOHR_FACTOR),
+            "species": species,
+            "positions": np.divide(np.array([row[1] for row in block]), BOHR_FACTOR),
+            "forces": np.multiply(np.array([row[2] for row in block]), BOHR_RYDBERG),
+            "energy": float('nan') if energy is None else energy,
+        }
 
 class RMGLog:
-    def __init__(self, directory_path):
+    def __init__(self, directory_path, use_cache=False, cache_directory=None, log_files=None):
         self.directory_path = directory_path
-        self.logs_data = self._parse_logs()
-        self.logs_keys = list(self.logs_data.keys())
-    
+        if log_files is None:  # Callers holding a scanner.RunDirectory pass its log_files
+            log_files = glob.glob(os.path.join(self.directory_path, 'rmg_input.*.log'))
+        self.log_files = sorted(log_files)
+        self.logs_keys = list(self.log_files)
+        self.cache = None
+        if use_cache:
+            from pyRMG.log_cache import LogCache
+            self.cache = LogCache(cache_directory) if cache_directory else LogCache()
+        self._logs_data = None
+
+    @property
+    def logs_data(self):
+        """Every frame of every log, parsed on first access."""
+        if self._logs_data is None:
+            self._logs_data = self._parse_logs()
+        return self._logs_data
+
+    @staticmethod
+    def iter_frames(log_file):
+        """Lazily yield the completed ionic frames of a single log file."""
+        with open(log_file, 'r') as f:
+            yield from RMGLogParser().parse(f)
+
+    @staticmethod
+    def scan_frames(log_file, offset=0, parser=None):
+        """
+        Parses log_file from byte offset with parser and returns (frames, energies, end_offset).
+
+        Only newline-terminated lines are consumed; a trailing line that is still being written
+        is left for the next scan. parser.get_state() then describes the log up to end_offset,
+        so scanning can later resume from exactly that point.
+        """
+        parser = parser or RMGLogParser()
+        frames, energies = [], []
+        with open(log_file, 'rb') as f:
+            f.seek(offset)
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break
+                offset += len(raw_line)
+                frame = parser.feed(raw_line.decode(errors='replace'))
+                if frame is not None:
+                    frames.append(frame)
+                if parser.last_record == ENERGY:
+                    energies.append(parser.energy)
+        return frames, energies, offset
+
+    @staticmethod
+    def scf_steps(log_file):
+        """(ionic step, scf step, step time, cumulative scf time) for every quench line of log_file."""
+        return RMGLog.timings(log_file)["scf_steps"]
+
+    @staticmethod
+    def timings(log_file):
+        """
+        Timing records of log_file:
+        - scf_steps: (ionic step, scf step, step time, cumulative scf time) per quench line
+        - ionic_steps: (ionic step, scf iterations, summed step time) per ionic step
+        - total_time: run time from the closing timing report, None if the run did not finish
+        - walltime: total_time, or the summed step times of an unfinished run
+        """
+        steps, total_time = [], None
+        with open(log_file, 'r') as f:
+            for line in f:
+                if 'step time' in line or '1-TOTAL' in line:
+                    token = tokenize_line(line)
+                    if token and token[0] == SCF_STEP:
+                        steps.append(token[1])
+                    elif token and token[0] == TOTAL_TIME:
+                        total_time = token[1]
+
+        ionic_steps = {}
+        for md, scf, step_time, _ in steps:
+            iterations, elapsed = ionic_steps.get(md, (0, 0.0))
+            ionic_steps[md] = (max(iterations, scf), elapsed + step_time)
+        return {
+            "scf_steps": steps,
+            "ionic_steps": [(md, iterations, elapsed) for md, (iterations, elapsed) in sorted(ionic_steps.items())],
+            "total_time": total_time,
+            "walltime": total_time if total_time is not None else sum(step[2] for step in steps),
+        }
+
+    @staticmethod
+    def frame_to_structure(frame):
+        from pymatgen.core import Structure
+        return Structure(lattice=frame["lattice"], species=frame["species"],
+                         coords=frame["positions"], coords_are_cartesian=True)
+
+    @staticmethod
+    def _head_lattice(f, block_size=65536):
+        """Reads the leading Basis Vector records of an open binary log."""
+        parser = RMGLogParser()
+        f.seek(0)
+        remainder = b''
+        while parser.lattice is None:
+            data = f.read(block_size)
+            if not data:
+                break
+            lines = (remainder + data).split(b'\n')
+            remainder = lines.pop()
+            for line in lines:
+                line = line.decode(errors='replace')
+                if "@ION" in line:
+                    return parser.lattice
+                parser.feed(line)
+                if parser.lattice is not None:
+                    break
+        return parser.lattice
+
+    @staticmethod
+    def tail_frame(log_file, block_size=1 << 20):
+        """
+        Returns the final complete frame of a log while reading as little of it as possible.
+
+        Windows are read backwards from the end of the file and doubled until they contain
+        at least two closed @ION blocks, which guarantees the final block is whole and that
+        any per-step lattice update preceding it is inside the window. Lattice rows before the
+        first closed block are dropped, since the window may start inside a lattice group. The
+        header lattice seeds the parser for fixed-cell runs that never print a lattice update.
+        """
+        with open(log_file, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            seed_lattice = RMGLog._head_lattice(f)
+            window = block_size
+            while True:
+                start = max(0, size - window)
+                f.seek(start)
+                data = f.read(size - start)
+                if start:
+                    data = data[data.find(b'\n') + 1:]  # Drop the partial first line
+
+                parser = RMGLogParser()
+                parser.lattice = seed_lattice
+                parser.discard_partial_lattice = bool(start)
+                frames = collections.deque(parser.parse(data.decode(errors='replace').splitlines(True)), maxlen=2)
+                if start == 0:
+                    return frames[-1] if frames else None
+                if len(frames) == 2:
+                    return frames[-1]
+                window *= 2
+
+    def last_image(self, tail=True):
+        """
+        Returns (log_file, Structure) for the final frame of the newest log with a complete frame.
+        With tail=True only the end of each log is read; tail=False streams every frame.
+        """
+        for log_file in reversed(self.log_files):
+            if tail:
+                last_frame = self.tail_frame(log_file)
+            else:
+                last_frame = collections.deque(self.iter_frames(log_file), maxlen=1)
+                last_frame = last_frame[0] if last_frame else None
+            if last_frame is not None:
+                return log_file, self.frame_to_structure(last_frame)
+        return None, None
+
+    def last_structure(self):
+        return self.last_image()[1]
+
+    @staticmethod
+    def trajectory(log_file):
+        """Parses every complete frame of log_file into an RMGTrajectory."""
+        return RMGTrajectory.from_frames(RMGLog.iter_frames(log_file))
+
     def _parse_logs(self):
-        log_files = glob.glob(os.path.join(self.directory_path, 'rmg_input.*.log'))
-        
         logs_data = {}
-        bohr_factor = 1.8897259886  # Convert Bohr to Angstroms
-        rydberg_factor = 2
-        bohr_rydberg = np.divide(rydberg_factor, bohr_factor)  # Convert forces
-        
-        for log_file in sorted(log_files):
-            structures, forces, energies = [], [], []
-            all_lattices, all_positions, all_species, all_forces = [], [], [], []
-            current_lattice, current_position, current_specie, current_force = [], [], [], []
-            
-            with open(log_file, 'r') as f:
-                for line in f:
-                    if "X Basis Vector" in line or "Y Basis Vector" in line or "Z Basis Vector" in line:
-                        split_lines = line.split()
-                        try:
-                            current_lattice.append([float(split_lines[3]), float(split_lines[4]), float(split_lines[5])])
-                            if len(current_lattice) == 3:
-                                all_lattices.append(current_lattice)
-                                current_lattice = []
-                        except IndexError:
-                            continue
-                    
-                    elif "lattice" in line:
-                        split_lines = line.split()
-                        try:
-                            current_lattice.append([float(split_lines[2]), float(split_lines[3]), float(split_lines[4])])
-                            if len(current_lattice) == 3:
-                                all_lattices.append(current_lattice)
-                                current_lattice = []
-                        except IndexError:
-                            continue
-                    
-                    elif "@ION" in line:
-                        split_lines = line.split()
-                        try:
-                            if isinstance(eval(split_lines[1]), int):  # Integer indicating species number
-                                current_position.append([float(split_lines[3]), float(split_lines[4]), float(split_lines[5])])
-                                current_specie.append(split_lines[2])
-                                current_force.append([float(split_lines[7]), float(split_lines[8]), float(split_lines[9])])
-                        except (NameError, IndexError):
-                            continue
-                    
-                    all_positions.append(current_position)
-                    all_species.append(current_specie)
-                    all_forces.append(current_force)
-                    current_position, current_specie, current_force = [], [], []
-                    
-                    if "final total energy from eig sum" in line:
-                        energies.append(float(line.split('=')[-1].strip().split()[0]))
-            
-            if len(all_lattices) == 1:
-                check_lattices = [all_lattices[0] for _ in range(len(all_positions))]
-            else:
-                check_lattices = all_lattices
-            
-            number_complete = min(len(check_lattices), len(all_positions))
-            energies = energies[:number_complete] 
-
-            for i in range(number_complete):
-                lattice_angstroms = np.divide(np.array(check_lattices[i]), bohr_factor)
-                lattice_positions = np.divide(np.array(all_positions[i]), bohr_factor)
-                force_hartree_angstrom = np.multiply(np.array(all_forces[i]), bohr_rydberg)
-                
-                s = Structure(lattice=lattice_angstroms, species=all_species[i],
-                              coords=lattice_positions, coords_are_cartesian=True)
-                structures.append(s)
-                forces.append(force_hartree_angstrom)
-            
+        for log_file in self.log_files:
+            trajectory = self.cache.load(log_file) if self.cache else self.trajectory(log_file)
             logs_data[log_file] = {
-                "structures": structures,
-                "forces": forces,
-                "energies": energies
+                "trajectory": trajectory,
+                "structures": trajectory,  # Structures are built on index access
+                "forces": trajectory.forces,
+                "energies": trajectory.energies
             }
-        
+
         return logs_data
-    
+
+    @classmethod
+    def parse_tree(cls, parent_directory, workers=None, use_cache=False, cache_directory=None):
+        """
+        Parses every rmg_input.*.log below parent_directory across a process pool.
+
+        Returns (results, stats): results maps each directory containing logs to
+        {log_file: RMGTrajectory}, and stats records counts, failures and timings.
+        workers=1 parses in the calling process; None uses os.cpu_count().
+        """
+        start = time.perf_counter()
+        directories = [root for root, _, files in os.walk(os.path.abspath(parent_directory))
+                       if any(f.startswith('rmg_input.') and f.endswith('.log') for f in files)]
+        tasks = [(directory, use_cache, cache_directory) for directory in directories]
+
+        if workers == 1 or len(tasks) <= 1:
+            parsed = [_parse_directory(task) for task in tasks]
+        else:
+            workers = workers or os.cpu_count()
+            chunksize = max(1, len(tasks) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = list(executor.map(_parse_directory, tasks, chunksize=chunksize))
+
+        results, failures, parse_times = {}, {}, {}
+        for directory, trajectories, error, elapsed in parsed:
+            parse_times[directory] = elapsed
+            if error:
+                failures[directory] = error
+            else:
+                results[directory] = trajectories
+
+        stats = {
+            "directories": len(results),
+            "logs": sum(len(trajectories) for trajectories in results.values()),
+            "frames": sum(len(t) for trajectories in results.values() for t in trajectories.values()),
+            "failures": failures,
+            "workers": workers or os.cpu_count(),
+            "parse_times": parse_times,
+            "cpu_time": sum(parse_times.values()),
+            "wall_time": time.perf_counter() - start,
+        }
+        return results, stats
+
     def get_log_data(self, log_file=None):
         if log_file:
             return self.logs_data.get(log_file, None)
         return self.logs_data
 
+def _parse_directory(task):
+    """Process-pool worker for RMGLog.parse_tree; returns (directory, trajectories, error, seconds)."""
+    directory, use_cache, cache_directory = task
+    start = time.perf_counter()
+    try:
+        rmg_log = RMGLog(directory, use_cache=use_cache, cache_directory=cache_directory)
+        trajectories = {log_file: data["trajectory"] for log_file, data in rmg_log.logs_data.items()}
+        return directory, trajectories, None, time.perf_counter() - start
+    except Exception as e:
+        return directory, None, f'{type(e).__name__}: {e}', time.perf_counter() - start
+
+class RMGLogFollower:
+    """
+    Polls a growing rmg_input.*.log, parsing only the bytes written since the last poll.
+
+    The byte offset, inode and parser state are exposed through .state as a JSON-serializable
+    dictionary, so a monitoring loop can persist it and resume in a later process:
+
+        follower = RMGLogFollower(log_file, state=json.load(f))
+        frames, energies = follower.poll()
+    """
+    def __init__(self, log_file, state=None):
+        self.log_file = log_file
+        self.offset, self.inode = 0, None
+        self.parser = RMGLogParser()
+        if state:
+            self.offset, self.inode = state["offset"], state["inode"]
+            self.parser = RMGLogParser.from_state(state["parser"])
+
+    @property
+    def state(self):
+        return {"offset": self.offset, "inode": self.inode, "parser": self.parser.get_state()}
+
+    def poll(self):
+        """Returns (frames, energies) completed since the previous poll; restarts if the log was replaced or truncated."""
+        if not os.path.exists(self.log_file):
+            return [], []
+        stat = os.stat(self.log_file)
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.offset, self.inode = 0, stat.st_ino
+            self.parser = RMGLogParser()
+        if stat.st_size == self.offset:
+            return [], []
+
+        frames, energies, self.offset = RMGLog.scan_frames(self.log_file, self.offset, self.parser)
+        return frames, energies
@@ -0,0 +1,68 @@
+import os
+
+LOG_PREFIX, LOG_SUFFIX = 'rmg_input.', '.log'
+SCRIPT_SUFFIXES = ('.sh', '.lsf')
+
+class RunDirectory:
+    """
+    The files of one directory that the pyRMG CLIs look at, with the os.stat_result of each.
+
+    Built by scan_tree, so membership checks and log/script lookups need no further
+    filesystem calls.
+    """
+    def __init__(self, path, files):
+        self.path = path
+        self.files = files  # File name -> os.stat_result
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def file_path(self, name):
+        """Full path of name if the directory contains it, otherwise None."""
+        return os.path.join(self.path, name) if name in self.files else None
+
+    def stat(self, name):
+        return self.files.get(name)
+
+    @property
+    def log_files(self):
+        """Sorted paths of the rmg_input.*.log files."""
+        return [os.path.join(self.path, name) for name in sorted(self.files)
+                if name.startswith(LOG_PREFIX) and name.endswith(LOG_SUFFIX)]
+
+    def scripts(self, suffix):
+        """Sorted paths of the submission scripts ending in suffix ('.sh' or '.lsf')."""
+        return [os.path.join(self.path, name) for name in sorted(self.files) if name.endswith(suffix)]
+
+def is_relevant(name, names):
+    return name in names or name.endswith(SCRIPT_SUFFIXES) or (name.startswith(LOG_PREFIX) and name.endswith(LOG_SUFFIX))
+
+def scan_tree(parent_directory, names=('rmg_input', 'POSCAR', 'MAGMOM.json', 'forcefield.xml')):
+    """
+    Indexes parent_directory and every directory below it with a single os.scandir pass.
+
+    Returns RunDirectory objects in the top-down order of os.walk. Each holds the files named
+    in names plus all rmg_input.*.log, *.sh and *.lsf files, stat-ed once during the scan.
+    Symbolic links to directories are not followed, matching os.walk.
+    """
+    names = set(names)
+    directories = []
+    stack = [os.path.abspath(parent_directory)]
+    while stack:
+        path = stack.pop()
+        files, subdirectories = {}, []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                        elif is_relevant(entry.name, names) and entry.is_file():
+                            files[entry.name] = entry.stat()
+                    except OSError:  # Entry removed or unreadable mid-scan
+                        continue
+        except OSError:
+            continue
+        directories.append(RunDirectory(path, files))
+        stack.extend(reversed(subdirectories))
+    return directories
@@ -0,0 +1,136 @@
+import math
+import heapq
+import collections
+import numpy as np
+
+def task_nodes(gpus, gpus_per_node):
+    """Whole nodes a task occupies; tasks smaller than a node share one."""
+    return max(1, math.ceil(gpus / gpus_per_node))
+
+def pack_tasks(gpus, runtimes, allocation_nodes, gpus_per_node=8):
+    """
+    Longest-processing-time list schedule of tasks onto allocation_nodes nodes.
+
+    Tasks are queued by predicted runtime (then GPU count) descending. Whenever a task finishes,
+    every queued task that fits is started, so short tasks backfill the gaps left by large ones.
+    Tasks of at least one node take whole free nodes; smaller tasks are placed first-fit on the
+    fullest node with enough free GPUs.
+
+    Returns a plan dictionary:
+    - order: task indices in start order
+    - start, end: (n_tasks,) predicted start and end times
+    - makespan: predicted time until the last task finishes
+    - utilization: busy GPU-time over allocated GPU-time for the makespan
+    - lower_bound: max(longest task, total GPU-time / allocated GPUs)
+    """
+    gpus, runtimes = np.asarray(gpus, dtype=int), np.asarray(runtimes, dtype=float)
+    n_tasks = len(gpus)
+    if np.any(gpus > allocation_nodes * gpus_per_node):
+        raise ValueError(f'A task needs {gpus.max()} GPUs, more than {allocation_nodes} nodes provide')
+
+    # Queues of equal demand (whole nodes, or GPUs for sub-node tasks), each in LPT order
+    rank = {i: r for r, i in enumerate(sorted(range(n_tasks), key=lambda i: (-runtimes[i], -gpus[i], i)))}
+    queues = collections.defaultdict(collections.deque)
+    for i in sorted(rank, key=rank.get):
+        whole = gpus[i] >= gpus_per_node
+        queues[(whole, task_nodes(gpus[i], gpus_per_node) if whole else gpus[i])].append(i)
+
+    free_nodes = allocation_nodes
+    partial = {}  # Node id -> free GPUs on nodes shared by sub-node tasks
+    next_node = 0
+    running = []  # Heap of (end time, task, placement)
+    start, end = np.zeros(n_tasks), np.zeros(n_tasks)
+    order, now = [], 0.0
+
+    while True:
+        # Start the highest-ranked queued task that fits until none does
+        while True:
+            most_free = max(partial.values(), default=0)
+            fitting = [queue[0] for (whole, demand), queue in queues.items() if queue and
+                       (demand <= free_nodes if whole else (demand <= most_free or free_nodes))]
+            if not fitting:
+                break
+            i = min(fitting, key=rank.get)
+            whole = gpus[i] >= gpus_per_node
+            queues[(whole, task_nodes(gpus[i], gpus_per_node) if whole else gpus[i])].popleft()
+            if whole:
+                free_nodes -= task_nodes(gpus[i], gpus_per_node)
+                placement = ('nodes', task_nodes(gpus[i], gpus_per_node))
+            else:
+                fits = [n for n, free in partial.items() if free >= gpus[i]]
+                if fits:
+                    node = min(fits, key=lambda n: (partial[n], n))
+                else:
+                    free_nodes -= 1
+                    node, next_node = next_node, next_node + 1
+                    partial[node] = gpus_per_node
+                partial[node] -= gpus[i]
+                placement = ('gpus', node)
+
+            start[i], end[i] = now, now + runtimes[i]
+            order.append(i)
+            heapq.heappush(running, (end[i], i, placement))
+        if not any(queues.values()):
+            break
+
+        # Advance to the next completion and release every task finishing then
+        now = running[0][0]
+        while running and running[0][0] <= now:
+            _, i, (kind, value) = heapq.heappop(running)
+            if kind == 'nodes':
+                free_nodes += value
+            else:
+                partial[value] += gpus[i]
+                if partial[value] == gpus_per_node:
+                    del partial[value]
+                    free_nodes += 1
+
+    makespan = float(end.max()) if n_tasks else 0.0
+    work = float(np.dot(gpus, runtimes))
+    capacity = allocation_nodes * gpus_per_node
+    return {
+        'order': order,
+        'start': start,
+        'end': end,
+        'makespan': makespan,
+        'utilization': work / (capacity * makespan) if makespan else 0.0,
+        'lower_bound': max(float(runtimes.max()) if n_tasks else 0.0, work / capacity),
+        'allocation_nodes': allocation_nodes,
+    }
+
+def candidate_allocations(gpus, gpus_per_node, max_candidates=256):
+    """Node counts from the largest task to running every task at once, thinned to max_candidates."""
+    smallest = max(task_nodes(g, gpus_per_node) for g in gpus)
+    largest = max(smallest, sum(task_nodes(g, gpus_per_node) for g in gpus))
+    if largest - smallest + 1 <= max_candidates:
+        return list(range(smallest, largest + 1))
+    return sorted(set(np.unique(np.geomspace(smallest, largest, max_candidates).round().astype(int)).tolist()))
+
+def recommend_allocation(gpus, runtimes, gpus_per_node=8, walltime=None, slack=0.1, max_candidates=64):
+    """
+    Node count with the fewest predicted node-hours (allocation * makespan) whose makespan fits walltime.
+
+    Without a walltime the target is the longest predicted task plus slack, i.e. the smallest
+    allocation that finishes about as early as the ensemble can. If no allocation meets the
+    target, the one with the shortest makespan is returned. Returns (allocation_nodes, plan).
+    """
+    target = walltime if walltime is not None else (1 + slack) * float(np.max(runtimes))
+    best, fastest = None, None
+    for allocation_nodes in candidate_allocations(gpus, gpus_per_node, max_candidates):
+        plan = pack_tasks(gpus, runtimes, allocation_nodes, gpus_per_node)
+        if fastest is None or plan['makespan'] < fastest[1]['makespan']:
+            fastest = (allocation_nodes, plan)
+        if plan['makespan'] > target:
+            continue
+        cost = (allocation_nodes * plan['makespan'], plan['makespan'])
+        if best is None or cost < best[0]:
+            best = (cost, allocation_nodes, plan)
+    return (best[1], best[2]) if best else fastest
+
+def format_plan(plan, labels, gpus):
+    """Printable lines of a packing plan, one per task in start order (numbered by that order), then the summary."""
+    lines = [f'Task ID: {position}, Path: {labels[i]}, Task GPUs: {gpus[i]}, '
+             f'Start: {plan["start"][i]:.0f} s, End: {plan["end"][i]:.0f} s' for position, i in enumerate(plan['order'])]
+    lines.append(f'\nAllocation: {plan["allocation_nodes"]} nodes, predicted makespan {plan["makespan"]:.0f} s '
+                 f'(lower bound {plan["lower_bound"]:.0f} s), GPU utilization {100 * plan["utilization"]:.1f}%')
+    return lines
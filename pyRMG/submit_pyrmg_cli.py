@@ -3,6 +3,8 @@ from pyRMG.forcefield import Forcefield
 from pyRMG.rmg_log import RMGLog
 from pyRMG.submitter import Submitter
 from pyRMG.convergence import RMGConvergence
+from pyRMG.scanner import scan_tree
+from pyRMG.campaign import CampaignManifest, NEW, NO_FORCEFIELD, UNCONVERGED, CONVERGED
 import argparse
 import os
 
@@ -20,6 +22,15 @@ def main():
     parser.add_argument("--move_to", "-mt", default='converged', help="Directory where the converged RMG structures will be moved")
     parser.add_argument("--move_name", "-mn", default='POSCAR', help="Name for the converged RMG structures")
     parser.add_argument("--pass_over", "-po", action="store_true", help="Resubmit continuation jobs or only submit new ones")
+    parser.add_argument("--rescan", "-rsc", action="store_true", help="Re-examine every directory instead of reusing unchanged states from the campaign manifest")
+    parser.add_argument("--skip_submitted", "-ss", action="store_true", help="Do not submit directories the campaign manifest records as submitted and unchanged since, e.g. jobs still queued")
+    parser.add_argument("--no_manifest", "-nm", action="store_true", help="Do not read or write the campaign manifest at the parent directory")
+    parser.add_argument("--array", "-arr", action="store_true", help="Submit directories with identical submission scripts together as Slurm/LSF job arrays")
+    parser.add_argument("--max_array_size", "-mas", type=int, default=1000, help="Most directories per job array; keep below the scheduler's MaxArraySize")
+    parser.add_argument("--array_throttle", "-at", type=int, default=0, help="Most tasks of each job array running at once; 0 for no limit")
+    parser.add_argument("--submit_workers", "-sw", type=int, default=1, help="Submissions run at once from a thread pool")
+    parser.add_argument("--submissions_per_second", "-sps", type=float, default=5, help="Most sbatch/bsub calls started per second; 0 for no limit")
+    parser.add_argument("--submit_retries", "-sr", type=int, default=3, help="Retries with exponential backoff when sbatch/bsub fails")
    
     args = parser.parse_args()
     submit(args)
@@ -54,49 +65,88 @@ def build_tree(root, to_path):
     new_rel_write_path = os.path.relpath(new_write_path, os.getcwd())
     return new_rel_write_path
 
+def job_state(run_directory, rmg_name):
+    """(state, calculation_mode) of a scanned directory holding rmg_name, derived from its files."""
+    rmg_input = RMGInput(input_file=os.path.join(run_directory.path, rmg_name), header_only=True)
+    if not run_directory.log_files:  # Job has not run
+        return NEW, rmg_input.keywords["calculation_mode"]
+    if 'forcefield.xml' not in run_directory:
+        return NO_FORCEFIELD, rmg_input.keywords["calculation_mode"]
+    forcefield = Forcefield(os.path.join(run_directory.path, 'forcefield.xml'))
+    convergence_checker = RMGConvergence(rmg_input=rmg_input, forcefield=forcefield)
+    return (CONVERGED if convergence_checker.is_converged() else UNCONVERGED), convergence_checker.calculation_mode
+
 def submit(args):
     abs_poscars_directory = os.path.abspath(args.parent_directory)
-    for root, _, _ in os.walk(abs_poscars_directory):
+    manifest = CampaignManifest(abs_poscars_directory) if not args.no_manifest else None
+    job_directories = []
+    submit_jobs = []  # (root, run_directory) submitted together after the scan
+    for run_directory in scan_tree(abs_poscars_directory, (args.rmg_name, 'forcefield.xml')):
+        root = run_directory.path
         rmg_input_path = os.path.join(root, args.rmg_name)
-        forcefield_path = os.path.join(root, 'forcefield.xml')
-        available_logs = Submitter.find_files(root, 'rmg_input.*.log')
+        if args.rmg_name not in run_directory:
+            continue
+        job_directories.append(root)
+
+        # Reuse the recorded state of directories whose files are unchanged since the last scan
+        known = None
+        if manifest:
+            signature = CampaignManifest.signature(run_directory, (args.rmg_name, 'forcefield.xml'))
+            known = None if args.rescan else manifest.lookup(root, signature)
+        state, calculation_mode = known or job_state(run_directory, args.rmg_name)
+        if manifest and not known:
+            manifest.record(root, signature, state, calculation_mode)
+
+        resubmit = args.submit and not args.pass_over
+        submit_job = (state in (UNCONVERGED, NO_FORCEFIELD) and resubmit) or (state == NEW and args.submit)
+        # On request, leave directories submitted since their files last changed to the jobs already queued
+        if submit_job and manifest and args.skip_submitted and manifest.is_submitted(root, signature):
+            print(f'{NO_YELLOW}{calculation_mode} job in {root} was already submitted and is unchanged since; '
+                  f'not submitting again (--skip_submitted).{ENDC}\n')
+            submit_job = False
+        elif state == CONVERGED:
+            print(f'{OK_GREEN}{calculation_mode} job at {rmg_input_path} is converged.{ENDC}\n')
+            if args.move:
+                write_directories = build_tree(root, args.move_to)
+                os.makedirs(write_directories, exist_ok=True)
+                write_path = os.path.join(write_directories, args.move_name)
+                image, final_structure = RMGLog(root, log_files=run_directory.log_files).last_image()
+                print(f'Moving final image from {image} to {write_path}.\n')
+                final_structure.to(write_path)
+        elif state == UNCONVERGED:
+            if resubmit:
+                print(f'{FAIL_RED}{calculation_mode} job in {root} is not converged; submitting continuation.{ENDC}\n')
+            else:
+                print(f'{FAIL_RED}{calculation_mode} job in {root} is not converged; not submitting continuation.{ENDC}\n')
+        elif state == NO_FORCEFIELD:
+            if resubmit:
+                print(f'{FAIL_RED}{calculation_mode} job in {root} does not have a forcefield.xml; submitting continuation.{ENDC}\n')
+            else:
+                print(f'{FAIL_RED}{calculation_mode} job in {root} does not have a forcefield.xml; not submitting continuation.{ENDC}\n')
+        elif args.submit:
+            print(f'{NO_YELLOW}Submitting new {calculation_mode} job in {root}.{ENDC}\n')
+        else:
+            print(f'{NO_YELLOW}Unsubmitted {calculation_mode} job in {root}.{ENDC}\n')
+
+        if submit_job:
+            submit_jobs.append((root, run_directory))
 
-        if os.path.exists(rmg_input_path):
-            rmg_input = RMGInput(input_file=rmg_input_path)
-            if available_logs:  # Job has run
-                rmg_logs = RMGLog(root)
-                if os.path.exists(forcefield_path): # A forcefield.xml was written
-                    forcefield = Forcefield(forcefield_path)
-                    convergence_checker = RMGConvergence(rmg_input=rmg_input, forcefield=forcefield)
-                    if convergence_checker.is_converged():
-                        print(f'{OK_GREEN}{convergence_checker.calculation_mode} job at {rmg_input_path} is converged.{ENDC}\n')
-                        if args.move:
-                            write_directories = build_tree(root, args.move_to)
-                            os.makedirs(write_directories, exist_ok=True)
-                            write_path = os.path.join(write_directories, args.move_name)
-                            log_images = sorted(rmg_logs.logs_data.keys())
-                            final_structure = rmg_logs.logs_data[log_images[-1]]['structures'][-1]
-                            print(f'Moving final image from {log_images[-1]} to {write_path}.\n')
-                            final_structure.to(write_path)
-                    else:
-                        if args.submit and not args.pass_over:
-                            print(f'{FAIL_RED}{convergence_checker.calculation_mode} job in {root} is not converged; submitting continuation.{ENDC}\n')
-                            Submitter.submit(abs_poscars_directory, root)
-                        else:
-                            print(f'{FAIL_RED}{convergence_checker.calculation_mode} job in {root} is not converged; not submitting continuation.{ENDC}\n')
+    if submit_jobs:
+        if args.array:
+            submitted = Submitter.submit_arrays(abs_poscars_directory, submit_jobs, args.max_array_size, args.array_throttle,
+                                                args.submissions_per_second, args.submit_retries)
+        else:
+            submitted = Submitter.submit_many(submit_jobs, args.submit_workers, args.submissions_per_second, args.submit_retries)
+        for root in submitted:
+            if manifest:
+                manifest.mark_submitted(root)
 
-                else:
-                    if args.submit and not args.pass_over:
-                        print(f'{FAIL_RED}{rmg_input.keywords["calculation_mode"]} job in {root} does not have a forcefield.xml; submitting continuation.{ENDC}\n')
-                        Submitter.submit(abs_poscars_directory, root)
-                    else:
-                        print(f'{FAIL_RED}{rmg_input.keywords["calculation_mode"]} job in {root} does not have a forcefield.xml; not submitting continuation.{ENDC}\n')
-            else: 
-                if args.submit:
-                    print(f'{NO_YELLOW}Submitting new {rmg_input.keywords["calculation_mode"]} job in {root}.{ENDC}\n')
-                    Submitter.submit(abs_poscars_directory, root)
-                else:
-                    print(f'{NO_YELLOW}Unsubmitted {rmg_input.keywords["calculation_mode"]} job in {root}.{ENDC}\n')
+    if manifest:
+        manifest.forget_missing(job_directories)
+        states = manifest.states()
+        print(f'Campaign {manifest.path}: ' + ', '.join(f'{states[s]} {s}' for s in (CONVERGED, UNCONVERGED, NO_FORCEFIELD, NEW)) +
+              f' ({manifest.examined} re-examined, {manifest.reused} unchanged)')
+        manifest.close()
 
 if __name__ == '__main__':
     main()
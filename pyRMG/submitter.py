@@ -1,21 +1,163 @@
 import os
-import glob
+import re
+import time
+import random
+import threading
 import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from pyRMG.job_array import SCHEDULERS, group_scripts, write_arrays
+
+JOB_RECORD_NAME = '.pyrmg_jobs'
+
+# sbatch: 'Submitted batch job 123'; bsub: 'Job <123> is submitted to queue <batch>.'
+JOB_ID = re.compile(r'Submitted batch job (\d+)|Job <(\d+)> is submitted')
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1 / rate seconds apart across threads; a rate of 0 disables the limit."""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        time.sleep(slot - now)
 
 class Submitter:
     @staticmethod
-    def submit(top, root):
-        os.chdir(root)
+    def submit(top, root, run_directory=None, retries=0, backoff=2.0):
+        '''
+        Submits the first submission script in root and returns its job ID, or None.
+
+        run_directory: optional scanner.RunDirectory of root, which spares a glob per script type.
+        The scheduler runs with root as its working directory; top is kept for existing callers.
+        '''
+        job_id, messages = Submitter._submit_directory(root, run_directory, retries, backoff)
+        for message in messages:
+            print(message)
+        return job_id
+
+    @staticmethod
+    def submit_many(jobs, workers=1, submissions_per_second=0, retries=3, backoff=2.0):
+        '''
+        Submits jobs, a list of (root, run_directory or None), from a pool of workers threads.
+
+        Submissions are started at most submissions_per_second apart (0 for no limit) and
+        failed ones are retried up to retries times with exponential backoff. Messages are
+        printed in the order of jobs; job IDs are appended to each directory's .pyrmg_jobs.
+        Returns the directories that were submitted.
+        '''
+        rate_limiter = RateLimiter(submissions_per_second)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = executor.map(lambda job: Submitter._submit_directory(job[0], job[1], retries, backoff, rate_limiter), jobs)
+            submitted = []
+            for (root, _), (job_id, messages) in zip(jobs, results):
+                for message in messages:
+                    print(message)
+                if job_id is not False:
+                    submitted.append(root)
+        return submitted
+
+    @staticmethod
+    def _submit_directory(root, run_directory, retries, backoff, rate_limiter=None):
+        ''' (job ID, None if unparsed, or False if not submitted; messages to print) for one directory '''
+        script = Submitter.submission_script(root, run_directory)
+        if not script:
+            return False, [f'No submission script in {root}; check that input files exist\n']
+        script_file, command = script
+        submitted, job_id, output = Submitter.run_submission(command, os.path.basename(script_file), root,
+                                                             retries, backoff, rate_limiter)
+        if not submitted:
+            return False, [f'{command} failed for {script_file}: {output}\n']
+        Submitter.record_job(root, job_id, os.path.basename(script_file))
+        job = f' as job {job_id}' if job_id else ''
+        return job_id, ([output] if output else []) + [f'{root} resubmitted using {os.path.splitext(script_file)[1]}{job}\n']
+
+    @staticmethod
+    def run_submission(command, script_name, cwd, retries=3, backoff=2.0, rate_limiter=None):
+        '''
+        Runs 'command script_name' in cwd, retrying scheduler errors with exponential backoff.
+
+        Returns (submitted, job ID or None, scheduler output).
+        '''
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            if rate_limiter:
+                rate_limiter.wait()
+            try:
+                result = subprocess.run([command, script_name], cwd=cwd, capture_output=True, text=True)
+            except OSError as e:  # Scheduler command missing; retrying will not help
+                return False, None, str(e)
+            output = (result.stdout + result.stderr).strip()
+            if result.returncode == 0:
+                match = JOB_ID.search(result.stdout)
+                return True, (match.group(1) or match.group(2)) if match else None, output
+        return False, None, output or f'exit code {result.returncode}'
+
+    @staticmethod
+    def record_job(directory, job_id, script_name):
+        ''' Appends '<job ID> <script> <time>' to directory/.pyrmg_jobs '''
+        with open(os.path.join(directory, JOB_RECORD_NAME), 'a') as f:
+            f.write(f'{job_id or "unknown"} {script_name} {time.strftime("%Y-%m-%dT%H:%M:%S")}\n')
+
+    @staticmethod
+    def submission_script(root, run_directory=None):
+        ''' (script path, command) of the first .sh (sbatch) or .lsf (bsub) script in root, or None '''
         for script_type, command in {'.sh': 'sbatch', '.lsf': 'bsub'}.items():
-            script_files = Submitter.find_files(root, script_type)
+            if run_directory is not None:
+                script_files = run_directory.scripts(script_type)
+            else:
+                script_files = sorted(str(f) for f in Submitter.find_files(root, script_type))
             if script_files:
-                subprocess.call([command, str(script_files[0].name)]) # Submits the first found
-                print(f'{root} resubmitted using {script_type}\n')
-                break
-        else:
-            print(f'No submission script in {root}; check that input files exist\n')
-        os.chdir(top)
+                return script_files[0], command
+        return None
+
+    @staticmethod
+    def submit_arrays(top, jobs, max_array_size=1000, throttle=0, submissions_per_second=0, retries=3, backoff=2.0):
+        '''
+        Submits jobs, a list of (root, run_directory or None), as Slurm/LSF job arrays.
+
+        Directories with identical submission scripts share an array; the array scripts and
+        the index files mapping array task IDs to directories are written under top (see
+        job_array.write_arrays). Each directory records '<array job ID>_<task ID>' in its
+        .pyrmg_jobs. Returns the directories whose array was accepted.
+        '''
+        scripts = []
+        for root, run_directory in jobs:
+            script = Submitter.submission_script(root, run_directory)
+            if script:
+                scripts.append((root, script[0]))
+            else:
+                print(f'No submission script in {root}; check that input files exist\n')
+        if not scripts:
+            return []
+
+        rate_limiter = RateLimiter(submissions_per_second)
+        submitted = []
+        for array in write_arrays(top, group_scripts(scripts), max_array_size, throttle):
+            array_directory, script_name = os.path.split(array['script'])
+            accepted, job_id, output = Submitter.run_submission(array['command'], script_name, array_directory,
+                                                                retries, backoff, rate_limiter)
+            if not accepted:
+                print(f'{array["command"]} failed for {array["script"]}: {output}; '
+                      f'{len(array["directories"])} directories not submitted\n')
+                continue
+            if output:
+                print(output)
+            print(f'{len(array["directories"])} directories submitted as a job array using {array["script"]} '
+                  f'(index {array["index"]})\n')
+            first_id = SCHEDULERS[os.path.splitext(script_name)[1]]['first_id']
+            for task_id, directory in enumerate(array['directories'], first_id):
+                Submitter.record_job(directory, f'{job_id}_{task_id}' if job_id else None, script_name)
+            submitted.extend(array['directories'])
+        return submitted
 
     @staticmethod
     def find_files(path, identifier):
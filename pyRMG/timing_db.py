@@ -0,0 +1,190 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+import numpy as np
+from pyRMG.cost_model import features_from_keywords
+
+TIMING_DATABASE = "~/.pyRMG/timings.sqlite"
+
+RUN_COLUMNS = ('log_file', 'directory', 'machine', 'composition', 'natoms', 'wavefunction_grid', 'kpoint_mesh',
+               'kpoint_distribution', 'processor_grid', 'gpus', 'nodes', 'gpus_per_node', 'grid_points', 'states',
+               'kpoints_per_group', 'spin_factor', 'ionic_steps', 'scf_steps', 'median_step_time', 'mean_step_time',
+               'total_time', 'walltime', 'log_size', 'log_mtime_ns', 'harvested')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs ({', '.join(c + (' TEXT PRIMARY KEY' if c == 'log_file' else '') for c in RUN_COLUMNS)});
+CREATE INDEX IF NOT EXISTS runs_key ON runs (composition, natoms, wavefunction_grid, kpoint_mesh, processor_grid, nodes);
+CREATE TABLE IF NOT EXISTS scf_steps (log_file TEXT, md INTEGER, scf INTEGER, step_time REAL, scf_time REAL);
+CREATE INDEX IF NOT EXISTS scf_steps_log ON scf_steps (log_file);
+CREATE TABLE IF NOT EXISTS ionic_steps (log_file TEXT, md INTEGER, scf_iterations INTEGER, step_time REAL);
+CREATE INDEX IF NOT EXISTS ionic_steps_log ON ionic_steps (log_file);
+"""
+
+def default_machine():
+    """Machine name from the site environment (LMOD_SYSTEM_NAME on Frontier, NERSC_HOST on Perlmutter)."""
+    return os.environ.get('LMOD_SYSTEM_NAME') or os.environ.get('NERSC_HOST') or os.uname().nodename
+
+def read_job_resources(directory):
+    """(nodes, gpus_per_node) from the NNODES/GPUS_PER_NODE variables of the first .sh in directory."""
+    nodes, gpus_per_node = None, None
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.sh'):
+            continue
+        with open(os.path.join(directory, name), 'r') as f:
+            for line in f:
+                match = re.match(r'\s*(NNODES|GPUS_PER_NODE)\s*=\s*(\d+)\s*$', line)
+                if match and match.group(1) == 'NNODES':
+                    nodes = int(match.group(2))
+                elif match:
+                    gpus_per_node = int(match.group(2))
+        break
+    return nodes, gpus_per_node
+
+class TimingDatabase:
+    """
+    SQLite store of the timings RMG writes to its logs, one runs row per rmg_input.*.log.
+
+    Runs are keyed by composition, atom count, wavefunction grid, k-point mesh, processor
+    grid and node count; the per-SCF and per-ionic step timings are kept in their own tables.
+    """
+    def __init__(self, path=TIMING_DATABASE):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def harvest(self, parent_directory, rmg_name='rmg_input', pseudopotentials_directory='', machine=None):
+        """
+        Adds every timed log below parent_directory; logs unchanged since their last harvest are skipped.
+        Returns counts of added, unchanged and skipped (no input, unknown valences or no timings) logs.
+        """
+        from pyRMG.rmg_input import RMGInput
+        from pyRMG.rmg_log import RMGLog
+
+        machine = machine or default_machine()
+        counts = {'added': 0, 'unchanged': 0, 'skipped': 0}
+        for root, _, files in os.walk(os.path.abspath(parent_directory)):
+            logs = sorted(os.path.join(root, f) for f in files if f.startswith('rmg_input.') and f.endswith('.log'))
+            if not logs:
+                continue
+            stale = [log for log in logs if not self._is_current(log)]
+            counts['unchanged'] += len(logs) - len(stale)
+            if not stale:
+                continue
+            if rmg_name not in files:
+                counts['skipped'] += len(stale)
+                continue
+
+            rmg_input = RMGInput(input_file=os.path.join(root, rmg_name))
+            keywords = rmg_input.keywords
+            if any(k not in keywords for k in ('processor_grid', 'wavefunction_grid', 'kpoint_mesh')):
+                counts['skipped'] += len(stale)
+                continue
+            total_electrons = rmg_input.valence_electrons(pseudopotentials_directory)
+            if total_electrons is None:
+                counts['skipped'] += len(stale)
+                continue
+            nodes, gpus_per_node = read_job_resources(root)
+            run = {
+                'directory': root,
+                'machine': machine,
+                'composition': rmg_input.structure.composition.reduced_formula,
+                'natoms': len(rmg_input.structure),
+                'wavefunction_grid': keywords['wavefunction_grid'],
+                'kpoint_mesh': keywords['kpoint_mesh'],
+                'kpoint_distribution': int(keywords.get('kpoint_distribution', 1)),
+                'processor_grid': keywords['processor_grid'],
+                'gpus': int(np.prod([int(p) for p in keywords['processor_grid'].split()])),
+                'nodes': nodes,
+                'gpus_per_node': gpus_per_node,
+                **features_from_keywords(keywords, total_electrons),
+            }
+            for log_file in stale:
+                if self.add_log(log_file, run, RMGLog.timings(log_file)):
+                    counts['added'] += 1
+                else:
+                    counts['skipped'] += 1
+        self.connection.commit()
+        return counts
+
+    def add_log(self, log_file, run, timings):
+        """Replaces the rows of log_file with run (job description) and timings (RMGLog.timings); False if untimed."""
+        if not timings['scf_steps']:
+            return False
+        step_times = [step[2] for step in timings['scf_steps']]
+        stat = os.stat(log_file)
+        row = dict(run, log_file=log_file, ionic_steps=len(timings['ionic_steps']), scf_steps=len(step_times),
+                   median_step_time=float(np.median(step_times)), mean_step_time=float(np.mean(step_times)),
+                   total_time=timings['total_time'], walltime=timings['walltime'],
+                   log_size=stat.st_size, log_mtime_ns=stat.st_mtime_ns, harvested=time.time())
+
+        with self.connection:
+            for table in ('runs', 'scf_steps', 'ionic_steps'):
+                self.connection.execute(f'DELETE FROM {table} WHERE log_file = ?', (log_file,))
+            self.connection.execute(f'INSERT INTO runs ({", ".join(RUN_COLUMNS)}) VALUES ({", ".join("?" * len(RUN_COLUMNS))})',
+                                    [row.get(c) for c in RUN_COLUMNS])
+            self.connection.executemany('INSERT INTO scf_steps VALUES (?, ?, ?, ?, ?)',
+                                        [(log_file, *step) for step in timings['scf_steps']])
+            self.connection.executemany('INSERT INTO ionic_steps VALUES (?, ?, ?, ?)',
+                                        [(log_file, *step) for step in timings['ionic_steps']])
+        return True
+
+    def _is_current(self, log_file):
+        row = self.connection.execute('SELECT log_size, log_mtime_ns FROM runs WHERE log_file = ?', (log_file,)).fetchone()
+        if row is None:
+            return False
+        stat = os.stat(log_file)
+        return (row['log_size'], row['log_mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+
+    def runs(self, **filters):
+        """Run rows as dictionaries, filtered by equality on any runs column (e.g. composition='Bi2Se3')."""
+        unknown = set(filters) - set(RUN_COLUMNS)
+        if unknown:
+            raise KeyError(f'Unknown runs columns: {sorted(unknown)}')
+        where = ' AND '.join(f'{column} = ?' for column in filters)
+        query = 'SELECT * FROM runs' + (f' WHERE {where}' if where else '') + ' ORDER BY log_file'
+        return [dict(row) for row in self.connection.execute(query, list(filters.values()))]
+
+    def fastest_decompositions(self, **filters):
+        """Processor grid and node combinations ordered by their best median SCF step time."""
+        where = ' AND '.join(f'{column} = ?' for column in filters if column in RUN_COLUMNS)
+        query = ('SELECT composition, natoms, wavefunction_grid, kpoint_mesh, processor_grid, nodes, machine, '
+                 'COUNT(*) AS runs, MIN(median_step_time) AS best_step_time, AVG(median_step_time) AS mean_step_time '
+                 'FROM runs' + (f' WHERE {where}' if where else '') +
+                 ' GROUP BY composition, natoms, wavefunction_grid, kpoint_mesh, processor_grid, nodes, machine'
+                 ' ORDER BY composition, wavefunction_grid, kpoint_mesh, best_step_time')
+        return [dict(row) for row in self.connection.execute(query, [v for c, v in filters.items() if c in RUN_COLUMNS])]
+
+    def records(self, **filters):
+        """Runs in the record format of FittedCostModel.fit (job features, 'gpus' and 'step_time')."""
+        return [dict(run, step_time=run['median_step_time']) for run in self.runs(**filters)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Harvest RMG log timings into a SQLite database")
+    parser.add_argument("--parent_directory", "-pd", default='.', help="Directory tree of RMG runs with rmg_input.*.log files")
+    parser.add_argument("--database", "-db", default=TIMING_DATABASE, help="Path to the timing database")
+    parser.add_argument("--rmg_name", "-rn", default='rmg_input', help="Naming convention for the RMG input files")
+    parser.add_argument("--pseudopotentials_directory", "-pspd", default='', help="Path to pseudopotentials directory")
+    parser.add_argument("--machine", "-m", default=None, help="Machine the runs used; defaults to the current site")
+    parser.add_argument("--fastest", "-f", action='store_true', help="Print the fastest decompositions per system")
+    args = parser.parse_args()
+
+    database = TimingDatabase(args.database)
+    counts = database.harvest(args.parent_directory, args.rmg_name, args.pseudopotentials_directory, args.machine)
+    print(f'Added {counts["added"]} logs, {counts["unchanged"]} unchanged, {counts["skipped"]} skipped (no timings, no input or unknown valences)')
+
+    if args.fastest:
+        for row in database.fastest_decompositions():
+            print(f'{row["composition"]} ({row["natoms"]} atoms) grid {row["wavefunction_grid"]} k {row["kpoint_mesh"]}: '
+                  f'processor_grid {row["processor_grid"]} on {row["nodes"]} nodes [{row["machine"]}] '
+                  f'{row["best_step_time"]:.3f} s/step over {row["runs"]} runs')
+    database.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import numpy as np
+
+class RMGTrajectory:
+    """
+    Ionic steps of a single RMG log stored as contiguous arrays.
+
+    - species: list of n_atoms species symbols shared by every frame
+    - lattices: (n_frames, 3, 3) lattice vectors in Angstroms
+    - positions: (n_frames, n_atoms, 3) Cartesian positions in Angstroms
+    - forces: (n_frames, n_atoms, 3) forces
+    - energies: (n_frames,) total energies, NaN where the log printed none
+    Structures are only built when a frame is indexed.
+    """
+    def __init__(self, species, lattices, positions, forces, energies):
+        self.species = list(species)
+        self.energies = np.ascontiguousarray(energies, dtype=np.float64).reshape(-1)
+        shape = (len(self.energies), len(self.species), 3)
+        self.lattices = np.ascontiguousarray(lattices, dtype=np.float64).reshape(len(self.energies), 3, 3)
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(shape)
+        self.forces = np.ascontiguousarray(forces, dtype=np.float64).reshape(shape)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Packs parser frame dictionaries; frames whose species differ from the first are skipped."""
+        species = None
+        lattices, positions, forces, energies = [], [], [], []
+        for frame in frames:
+            if species is None:
+                species = frame["species"]
+            elif frame["species"] != species:
+                continue
+            lattices.append(frame["lattice"])
+            positions.append(frame["positions"])
+            forces.append(frame["forces"])
+            energies.append(frame["energy"])
+
+        if species is None:
+            return cls.empty()
+        return cls(species, np.stack(lattices), np.stack(positions), np.stack(forces), energies)
+
+    def extend(self, frames):
+        """Returns a new trajectory with frames appended; frames of different species are skipped."""
+        if not self.n_frames:
+            return RMGTrajectory.from_frames(frames)
+        appended = RMGTrajectory.from_frames(frame for frame in frames if frame["species"] == self.species)
+        if not appended.n_frames:
+            return self
+        return RMGTrajectory(self.species,
+                             np.concatenate([self.lattices, appended.lattices]),
+                             np.concatenate([self.positions, appended.positions]),
+                             np.concatenate([self.forces, appended.forces]),
+                             np.concatenate([self.energies, appended.energies]))
+
+    @classmethod
+    def empty(cls):
+        return cls([], np.zeros((0, 3, 3)), np.zeros((0, 0, 3)), np.zeros((0, 0, 3)), np.zeros(0))
+
+    @property
+    def n_frames(self):
+        return len(self.energies)
+
+    @property
+    def n_atoms(self):
+        return len(self.species)
+
+    def __len__(self):
+        return self.n_frames
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RMGTrajectory(self.species, self.lattices[index], self.positions[index],
+                                 self.forces[index], self.energies[index])
+        return self.structure(index)
+
+    def __iter__(self):
+        for i in range(self.n_frames):
+            yield self.structure(i)
+
+    def structure(self, index):
+        """Materializes frame index as a pymatgen Structure."""
+        from pymatgen.core import Structure
+        return Structure(lattice=self.lattices[index], species=self.species,
+                         coords=self.positions[index], coords_are_cartesian=True)
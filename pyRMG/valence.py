@@ -1,6 +1,91 @@
 import sys
 import os
 import re
+import sqlite3
+import hashlib
+import functools
+
+Z_VALENCE = re.compile(r'z_valence="\s*([-+]?[\d\.]+(?:[eE][-+]?\d+)?)\s*"')
+
+# Optional SQLite table of z_valence keyed by pseudopotential file hash, shared between runs
+VALENCE_CACHE_PATH = None
+
+def set_valence_cache(path):
+    """Enables the persistent z_valence table at path, or disables it with None."""
+    global VALENCE_CACHE_PATH
+    VALENCE_CACHE_PATH = os.path.abspath(os.path.expanduser(path)) if path else None
+    if VALENCE_CACHE_PATH:
+        os.makedirs(os.path.dirname(VALENCE_CACHE_PATH), exist_ok=True)
+        with sqlite3.connect(VALENCE_CACHE_PATH, timeout=30) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS valences (hash TEXT PRIMARY KEY, z_valence REAL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)')
+
+def read_upf_valence(pseudo_path, block_size=65536):
+    """
+    z_valence of a .upf file, reading only up to the end of its PP_HEADER.
+    Falls back to scanning the whole file if the header does not carry it.
+    """
+    with open(pseudo_path, 'r') as fh:
+        header = ''
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                break
+            header += block
+            start = header.find('<PP_HEADER')
+            if start >= 0 and ('/>' in header[start:] or '</PP_HEADER>' in header[start:]):
+                break
+        match = Z_VALENCE.search(header)
+        if match:
+            return float(match.group(1))
+
+        z_valence = None
+        for line in fh:
+            match = Z_VALENCE.search(line)
+            if match:
+                z_valence = float(match.group(1))
+        return z_valence
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _persistent_valence(pseudo_path, size, mtime_ns):
+    try:
+        with sqlite3.connect(VALENCE_CACHE_PATH, timeout=30) as connection:
+            row = connection.execute('SELECT v.z_valence FROM files f JOIN valences v ON f.hash = v.hash '
+                                     'WHERE f.path = ? AND f.size = ? AND f.mtime_ns = ?', (pseudo_path, size, mtime_ns)).fetchone()
+            if row:
+                return row[0]
+            file_hash = _file_hash(pseudo_path)
+            row = connection.execute('SELECT z_valence FROM valences WHERE hash = ?', (file_hash,)).fetchone()
+            z_valence = row[0] if row else read_upf_valence(pseudo_path)
+            if z_valence is not None:
+                connection.execute('INSERT OR REPLACE INTO valences VALUES (?, ?)', (file_hash, z_valence))
+                connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (pseudo_path, size, mtime_ns, file_hash))
+            return z_valence
+    except sqlite3.Error:
+        return read_upf_valence(pseudo_path)  # An unavailable table only costs a re-read
+
+@functools.lru_cache(maxsize=1024)
+def _cached_upf_valence(pseudo_path, size, mtime_ns):
+    if VALENCE_CACHE_PATH is None:
+        return read_upf_valence(pseudo_path)
+    return _persistent_valence(pseudo_path, size, mtime_ns)
+
+def upf_valence(pseudo_path):
+    """
+    Memoized read_upf_valence, keyed on the path, size and mtime of the file.
+
+    After set_valence_cache(path), values also persist in an SQLite table keyed by file hash,
+    so a pseudopotential is only read once across runs and copies in other directories.
+    """
+    pseudo_path = os.path.abspath(pseudo_path)
+    stat = os.stat(pseudo_path)
+    return _cached_upf_valence(pseudo_path, stat.st_size, stat.st_mtime_ns)
 
 class ONCVValences:
     def __init__(self):
@@ -35,19 +120,15 @@ class GeneralValences:
         for element in pseudo_dict:
             if '.upf' in pseudo_dict[element]:
                 pseudo_path = os.path.join(self.pseudopotential_directory, pseudo_dict[element])
-                pattern = re.compile(r'z_valence="\s*([\d\.]+)"')
-                pattern_group = 1
             else:
                 print(f'Pseudopotential format for {element} not currently supported; defaulting to internal valences')
                 valence_dict[element] = ONCVValences().valence[element]
                 continue
 
             try:
-                with open(pseudo_path, 'r') as fh:
-                    for line in fh:
-                        m = pattern.search(line)
-                        if m:
-                            valence_dict[element] = float(m.group(pattern_group))
+                z_valence = upf_valence(pseudo_path)
+                if z_valence is not None:
+                    valence_dict[element] = z_valence
             except FileNotFoundError:
                 print(f'Pseudopotential {pseudo_dict[element]} not found; defaulting to internal valences')
                 valence_dict[element] = ONCVValences().valence[element]